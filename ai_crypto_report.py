@@ -13,6 +13,9 @@ from typing import List, Dict, Any, Optional
 
 import requests
 
+import cg_cache
+from ticker_matcher import TickerMatcher
+
 # ---- OpenAI ----
 try:
     from openai import OpenAI
@@ -38,6 +41,12 @@ HEADERS = {
 # Простой HTTP с ретраями
 # ---------------------------
 def _get(url: str, params: Optional[Dict[str, Any]] = None, retries: int = 4, timeout: int = 15) -> Any:
+    # ответы CoinGecko берём через общий кэш (см. cg_cache)
+    if url.startswith(COINGECKO_BASE):
+        return cg_cache.get_or_fetch(url, params, lambda: _fetch(url, params, retries, timeout))
+    return _fetch(url, params, retries, timeout)
+
+def _fetch(url: str, params: Optional[Dict[str, Any]] = None, retries: int = 4, timeout: int = 15) -> Any:
     last_err = None
     backoff = 1.0
     for _ in range(retries):
@@ -97,12 +106,11 @@ def fetch_reddit_mentions(tickers: List[str], subreddit: str = "CryptoCurrency",
         return {}
     reddit = praw.Reddit(client_id=cid, client_secret=secret, user_agent=ua)
     counts = {t.upper(): 0 for t in tickers if t}
+    matcher = TickerMatcher(list(counts))
     try:
         for sub in reddit.subreddit(subreddit).new(limit=limit):
-            text = f"{sub.title} {sub.selftext or ''}".upper()
-            for t in counts:
-                if f" {t} " in " " + text + " ":
-                    counts[t] += 1
+            for t in matcher.find(f"{sub.title} {sub.selftext or ''}"):
+                counts[t] += 1
     except Exception:
         pass
     return counts
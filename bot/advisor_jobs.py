@@ -1,46 +1,61 @@
 import os
+import asyncio
 import logging
 import traceback
-import httpx
 
-from signals.advisor import advise, format_advice
+import tg_delivery
+from signals.advisor import advise_many, format_advice
 
 log = logging.getLogger(__name__)
 print("📄 [advisor_jobs] Модуль загружен")
 
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN") or os.getenv("BOT_TOKEN")
 ADMIN_CHAT_ID = os.getenv("ADMIN_CHAT_ID") or os.getenv("CHAT_ID")
+# список тикеров советника; свечи по ним качаются пакетно, так что список может быть длинным
+ADVISOR_SYMBOLS = [s.strip().upper() for s in os.getenv("ADVISOR_SYMBOLS", "TSLA,GME").split(",") if s.strip()]
 
 def _escape_markdown(text: str) -> str:
     return text
 
-async def send_to_telegram(text: str) -> None:
+async def send_to_telegram(text: str) -> bool:
     if not TELEGRAM_TOKEN or not ADMIN_CHAT_ID:
         log.warning("send_to_telegram: missing TELEGRAM_BOT_TOKEN/BOT_TOKEN or ADMIN_CHAT_ID/CHAT_ID")
-        return
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-    payload = {"chat_id": int(ADMIN_CHAT_ID), "text": text}
+        return False
+    # запись в outbox tg_delivery (SQLite) — в потоке, чтобы не держать event loop даже на блокировке БД;
+    # саму отправку, пул соединений, лимиты и повторы делает фоновый поток доставки
+    queued = await asyncio.to_thread(
+        tg_delivery.enqueue, text, chat_id=str(int(ADMIN_CHAT_ID)), token=TELEGRAM_TOKEN,
+        parse_mode=None, disable_web_page_preview=False, source="advisor",
+    )
+    if not queued:
+        log.error("send_to_telegram: message not queued")
+    return queued
+
+async def _send_advice(symbol: str, rec) -> None:
     try:
-        async with httpx.AsyncClient(timeout=20) as client:
-            r = await client.post(url, json=payload)
-            r.raise_for_status()
+        if rec:
+            message = format_advice(symbol, "1D", rec)
+            if await send_to_telegram(_escape_markdown(message)):
+                print(f"✅ [advisor_jobs] Рекомендация по {symbol} поставлена в очередь")
+        else:
+            await send_to_telegram(_escape_markdown(f"Нет данных для {symbol}"))
+            print(f"ℹ️ [advisor_jobs] Нет данных для {symbol}")
     except Exception:
-        log.exception("send_to_telegram failed")
+        print(f"❌ [advisor_jobs] Ошибка обработки {symbol}:")
+        traceback.print_exc()
 
 async def run_tsla_gme_daily_job():
-    """Запуск анализа и рекомендаций для TSLA и GME (асинхронно)."""
-    print("🚀 [advisor_jobs] Запуск дневного задания советника (TSLA, GME)")
-    tickers = ["TSLA", "GME"]
-    for symbol in tickers:
-        try:
-            rec = advise(symbol, interval="1d", lookback=60)
-            if rec:
-                message = format_advice(symbol, "1D", rec)
-                await send_to_telegram(_escape_markdown(message))
-                print(f"✅ [advisor_jobs] Рекомендация по {symbol} отправлена")
-            else:
-                await send_to_telegram(_escape_markdown(f"Нет данных для {symbol}"))
-                print(f"ℹ️ [advisor_jobs] Нет данных для {symbol}")
-        except Exception:
-            print(f"❌ [advisor_jobs] Ошибка обработки {symbol}:")
-            traceback.print_exc()
+    """Запуск анализа и рекомендаций для ADVISOR_SYMBOLS (по умолчанию TSLA и GME, асинхронно)."""
+    tickers = ADVISOR_SYMBOLS
+    print(f"🚀 [advisor_jobs] Запуск дневного задания советника ({', '.join(tickers[:10])}"
+          f"{'…' if len(tickers) > 10 else ''})")
+    try:
+        # загрузка и pandas блокируют — уводим их в поток, event loop бота остаётся свободным.
+        # Один поток на весь пакет: yf.download не потокобезопасен, параллелизм внутри пакета даёт yfinance
+        recs = await asyncio.to_thread(advise_many, tickers, interval="1d", lookback=60)
+    except Exception:
+        print("❌ [advisor_jobs] Ошибка пакетного анализа:")
+        traceback.print_exc()
+        recs = {}
+    # сообщения только ставятся в очередь tg_delivery — темп отправки держит она
+    await asyncio.gather(*(_send_advice(symbol, recs.get(symbol)) for symbol in tickers))
@@ -0,0 +1,180 @@
+# cg_cache.py
+"""
+Общий кэш ответов CoinGecko для screener, crypto_monitor и ai_crypto_report.
+Ключ — URL + отсортированные параметры, TTL задаётся по эндпоинту.
+Горячие записи живут в LRU в памяти, все — в SQLite, чтобы пережить рестарт.
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlencode
+
+log = logging.getLogger(__name__)
+
+CACHE_PATH = os.getenv("CG_CACHE_PATH", "/tmp/cg_cache.sqlite")
+CACHE_ENABLED = os.getenv("CG_CACHE_ENABLED", "1") not in ("0", "false", "False")
+MAX_MEMORY_ITEMS = int(os.getenv("CG_CACHE_MAX_ITEMS", "256"))
+MAX_DISK_ITEMS = int(os.getenv("CG_CACHE_MAX_DISK_ITEMS", "5000"))
+
+# (шаблон пути, TTL в секундах); 0 — не кэшировать
+ENDPOINT_TTLS = [
+    (re.compile(r"/coins/markets$"), 300),
+    (re.compile(r"/coins/[^/]+/market_chart$"), 1800),
+    (re.compile(r"/search/trending$"), 600),
+    (re.compile(r"/ping$"), 0),
+]
+DEFAULT_TTL = 300
+
+
+def ttl_for(url: str) -> int:
+    path = url.split("?", 1)[0].rstrip("/")
+    for rx, ttl in ENDPOINT_TTLS:
+        if rx.search(path):
+            return ttl
+    return DEFAULT_TTL
+
+
+def make_key(url: str, params: Optional[Dict[str, Any]] = None) -> str:
+    if not params:
+        return url
+    norm = []
+    for k, v in sorted(params.items()):
+        if isinstance(v, bool):
+            v = "true" if v else "false"
+        norm.append((k, str(v)))
+    return f"{url}?{urlencode(norm)}"
+
+
+class ResponseCache:
+    def __init__(self, path: Optional[str] = CACHE_PATH, max_items: int = MAX_MEMORY_ITEMS,
+                 max_disk_items: int = MAX_DISK_ITEMS):
+        self.max_items = max_items
+        self.max_disk_items = max_disk_items
+        self._mem: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._db = None
+        if path:
+            try:
+                self._db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS cache ("
+                    " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                    " expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache(accessed_at)")
+                self._db.commit()
+            except sqlite3.Error:
+                log.exception("CG cache: не удалось открыть %s — работаю только в памяти", path)
+                self._db = None
+
+    def _remember(self, key: str, expires_at: float, value: Any) -> None:
+        self._mem[key] = (expires_at, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_items:
+            self._mem.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None:
+                if hit[0] > now:
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    return hit[1]
+                del self._mem[key]
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT value, expires_at FROM cache WHERE key = ? AND expires_at > ?", (key, now)
+                    ).fetchone()
+                    if row:
+                        self._db.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        value = json.loads(row[0])
+                        self._remember(key, row[1], value)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return value
+                except (sqlite3.Error, ValueError):
+                    log.exception("CG cache: ошибка чтения")
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        now = time.time()
+        expires_at = now + ttl
+        with self._lock:
+            self._remember(key, expires_at, value)
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO cache(key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), expires_at, now),
+                )
+                self._writes += 1
+                if self._writes % 100 == 0:
+                    self._evict_disk(now)
+                self._db.commit()
+            except (sqlite3.Error, TypeError, ValueError):
+                log.exception("CG cache: ошибка записи")
+
+    def _evict_disk(self, now: float) -> None:
+        self._db.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+        self._db.execute(
+            "DELETE FROM cache WHERE key IN ("
+            " SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_items,),
+        )
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "disk_hits": self.disk_hits,
+                    "memory_items": len(self._mem)}
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ResponseCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
+
+
+def get_or_fetch(url: str, params: Optional[Dict[str, Any]], fetch: Callable[[], Any]) -> Any:
+    """Вернуть ответ из кэша или вызвать fetch() и сохранить непустой результат."""
+    ttl = ttl_for(url)
+    if not CACHE_ENABLED or ttl <= 0:
+        return fetch()
+    cache = get_cache()
+    key = make_key(url, params)
+    value = cache.get(key)
+    if value is not None:
+        return value
+    value = fetch()
+    if value:
+        cache.set(key, value, ttl)
+    return value
+
+
+def stats() -> Dict[str, int]:
+    return get_cache().stats()
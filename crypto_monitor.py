@@ -5,6 +5,9 @@ import random
 from typing import List, Dict, Any
 import requests
 
+import cg_cache
+import tg_delivery
+
 log = logging.getLogger(__name__)
 
 COINGECKO = os.getenv("COINGECKO_BASE", "https://api.coingecko.com/api/v3")
@@ -23,6 +26,9 @@ TELEGRAM_CHAT_ID   = _get_env_any(["TELEGRAM_CHAT_ID","CHAT_ID","TG_CHAT_ID"])
 CRYPTO_TREND_ALERTS = os.getenv("CRYPTO_TREND_ALERTS", "1") not in ("0", "false", "False")
 
 def _get_json(url: str, *, retries: int = 4, timeout: int = 20) -> Dict[str, Any]:
+    return cg_cache.get_or_fetch(url, None, lambda: _fetch_json(url, retries=retries, timeout=timeout))
+
+def _fetch_json(url: str, *, retries: int = 4, timeout: int = 20) -> Dict[str, Any]:
     delay = 1.0
     for attempt in range(1, retries + 1):
         try:
@@ -77,12 +83,7 @@ def _send_telegram(text: str) -> None:
     if not (TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID):
         log.info("TG token/chat_id не заданы — пропускаю отправку (ok)")
         return
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    payload = {"chat_id": TELEGRAM_CHAT_ID, "text": text, "parse_mode": "HTML", "disable_web_page_preview": True}
-    try:
-        r = requests.post(url, json=payload, timeout=15); r.raise_for_status()
-    except requests.RequestException:
-        log.exception("Не удалось отправить сообщение в Telegram")
+    tg_delivery.enqueue(text, chat_id=TELEGRAM_CHAT_ID, token=TELEGRAM_BOT_TOKEN, source="crypto")
 
 def run_crypto_monitor() -> None:
     summary = collect_new_coins()
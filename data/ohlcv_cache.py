@@ -0,0 +1,240 @@
+# data/ohlcv_cache.py
+# Local incremental cache of daily OHLCV bars (memory-mapped .npy per symbol)
+from __future__ import annotations
+import os
+import json
+import time
+import threading
+import traceback
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+print("📄 [data/ohlcv_cache] Модуль загружен")
+
+__all__ = ["load_daily", "load_daily_many", "last_close", "cached_symbols", "read_cached", "backfill"]
+
+CACHE_DIR = os.getenv("OHLCV_CACHE_DIR", "/tmp/ohlcv_cache")
+CACHE_ENABLED = os.getenv("OHLCV_CACHE_ENABLED", "1") not in ("0", "false", "False")
+# сколько баров хранить для обычного lookback; история, заказанная длиннее (backfill), хранится целиком
+MAX_CACHED_ROWS = int(os.getenv("OHLCV_CACHE_MAX_ROWS", "600"))
+SPLIT_TOLERANCE = 0.01  # перекрывающий бар разошёлся сильнее — сплит/пересчёт, качаем историю заново
+
+NY_TZ = ZoneInfo("America/New_York")
+CLOSE_HOUR, CLOSE_MINUTE = 16, 30  # закрытие 16:00 + запас, пока Yahoo допишет дневной бар
+
+# колонки файла: время бара (UTC, секунды), open, high, low, close, volume
+COLUMNS = ["open", "high", "low", "close", "volume"]
+
+_lock = threading.Lock()
+
+
+def last_close(now: Optional[datetime] = None) -> datetime:
+    """Момент, после которого последний дневной бар США считается закрытым (праздники не учитываются)."""
+    now = (now or datetime.now(timezone.utc)).astimezone(NY_TZ)
+    close = now.replace(hour=CLOSE_HOUR, minute=CLOSE_MINUTE, second=0, microsecond=0)
+    if now < close:
+        close -= timedelta(days=1)
+    while close.weekday() >= 5:
+        close -= timedelta(days=1)
+    return close
+
+
+def _paths(symbol: str) -> Tuple[str, str]:
+    base = os.path.join(CACHE_DIR, symbol.upper().replace("/", "_"))
+    return f"{base}.npy", f"{base}.json"
+
+
+def _read(symbol: str) -> Tuple[Optional[np.ndarray], dict]:
+    npy, meta_path = _paths(symbol)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return np.load(npy, mmap_mode="r"), meta
+    except (OSError, ValueError):
+        return None, {}
+
+
+def _write(symbol: str, arr: np.ndarray, meta: dict) -> None:
+    # торговых дней меньше календарных, так что lookback_days строк заведомо хватает
+    max_rows = max(MAX_CACHED_ROWS, int(meta.get("lookback_days", 0)))
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    npy, meta_path = _paths(symbol)
+    # np.save сам добавляет .npy к имени без этого суффикса
+    tmp_npy, tmp_meta = f"{npy}.tmp.npy", f"{meta_path}.tmp"
+    np.save(tmp_npy, np.ascontiguousarray(arr[-max_rows:], dtype="float64"))
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_npy, npy)
+    os.replace(tmp_meta, meta_path)
+
+
+def _to_array(df: pd.DataFrame, until: datetime) -> np.ndarray:
+    """Кадр yfinance -> массив [ts, o, h, l, c, v] без незакрытого сегодняшнего бара."""
+    out = df.rename(columns={"Open": "open", "High": "high", "Low": "low", "Close": "close", "Volume": "volume"})
+    out = out[COLUMNS]
+    idx = out.index
+    idx = idx.tz_localize("UTC") if idx.tz is None else idx.tz_convert("UTC")
+    ts = idx.asi8 // 10**9
+    keep = np.asarray(idx.date) <= until.date()
+    arr = np.column_stack([ts.astype("float64"), out.to_numpy(dtype="float64", na_value=np.nan)])
+    return arr[keep]
+
+
+def _to_frame(arr: np.ndarray, rows: int = 320) -> pd.DataFrame:
+    frame = pd.DataFrame(
+        arr[:, 1:],
+        index=pd.to_datetime(arr[:, 0].astype("int64"), unit="s", utc=True),
+        columns=COLUMNS,
+    ).dropna()
+    return frame.iloc[-rows:] if len(frame) > rows else frame
+
+
+def cached_symbols():
+    """Символы, по которым есть файлы в кэше."""
+    try:
+        names = os.listdir(CACHE_DIR)
+    except OSError:
+        return []
+    return sorted(n[:-4] for n in names if n.endswith(".npy") and not n.endswith(".tmp.npy"))
+
+
+def read_cached(symbol: str) -> Optional[pd.DataFrame]:
+    """Вся сохранённая история символа без сети, колонки как у yfinance (Open/High/Low/Close/Volume)."""
+    arr, _ = _read(symbol)
+    if arr is None or not len(arr):
+        return None
+    frame = _to_frame(arr, rows=len(arr))
+    frame.columns = ["Open", "High", "Low", "Close", "Volume"]
+    return frame
+
+
+def backfill(symbols: Iterable[str], years: float = 10) -> Dict[str, int]:
+    """
+    Залить в кэш длинную историю (для бэктеста): пакетная загрузка на years лет.
+    Дальнейшие обычные load_daily догружают к ней свежие бары, не укорачивая. Возвращает {символ: баров}.
+    """
+    lookback_days = int(years * 365.25) + 7
+    frames = load_daily_many(symbols, lookback_days=lookback_days, rows=lookback_days)
+    return {s: len(df) for s, df in frames.items()}
+
+
+def _merge(cached: np.ndarray, fresh: np.ndarray) -> Optional[np.ndarray]:
+    """Дописать свежие бары; None — если перекрывающий бар не совпал (нужна полная перезагрузка)."""
+    if not len(fresh):
+        return np.asarray(cached)
+    start = fresh[0, 0]
+    overlap = cached[cached[:, 0] == start]
+    if len(overlap):
+        old_c, new_c = overlap[0, 4], fresh[0, 4]
+        if np.isfinite(old_c) and np.isfinite(new_c) and abs(new_c - old_c) > SPLIT_TOLERANCE * abs(old_c):
+            return None
+    return np.concatenate([cached[cached[:, 0] < start], fresh])
+
+
+def _plan(symbol: str, lookback_days: int, until: datetime):
+    """(кэш, meta, дата начала догрузки или None для полной загрузки, свежий ли кэш)."""
+    arr, meta = _read(symbol)
+    if arr is None or not len(arr) or meta.get("lookback_days", 0) < lookback_days:
+        return arr, meta, None, False
+    if meta.get("fetched_at", 0) >= until.timestamp():
+        return arr, meta, None, True
+    # последний бар качаем повторно: он мог быть записан до закрытия и служит проверкой на сплит
+    last_day = datetime.fromtimestamp(arr[-1, 0], tz=timezone.utc).date()
+    return arr, meta, last_day, False
+
+
+def _store(symbol: str, arr: Optional[np.ndarray], df: Optional[pd.DataFrame], start, lookback_days: int,
+           until: datetime, meta: Optional[dict] = None) -> Optional[np.ndarray]:
+    if df is None or df.empty:
+        return None
+    fresh = _to_array(df, until)
+    merged = fresh if start is None else _merge(arr, fresh)
+    if merged is None:
+        return None
+    if start is not None:
+        # догрузка к длинной истории (backfill) не должна её укорачивать до обычного lookback
+        lookback_days = max(lookback_days, int((meta or {}).get("lookback_days", 0)))
+    _write(symbol, merged, {"fetched_at": time.time(), "lookback_days": lookback_days})
+    return merged
+
+
+def _download(symbol: str, **kwargs) -> pd.DataFrame:
+    return yf.download(tickers=symbol, interval="1d", auto_adjust=False, threads=False, progress=False, **kwargs)
+
+
+def load_daily(symbol: str, lookback_days: int = 430, rows: int = 320) -> pd.DataFrame:
+    """
+    Дневные свечи через локальный кэш: тёплый символ после закрытия рынка отдаётся с диска без сети,
+    иначе догружаются только бары начиная с последнего сохранённого.
+    Формат как у load_stock_ohlcv_daily: [open, high, low, close, volume], индекс UTC, последние rows строк.
+    """
+    until = last_close()
+    with _lock:
+        arr, meta, start, fresh = _plan(symbol, lookback_days, until)
+        if fresh:
+            print(f"✅ [ohlcv_cache] {symbol}: из кэша ({len(arr)} свечей)")
+            return _to_frame(arr, rows)
+        merged = None
+        if start is not None:
+            merged = _store(symbol, arr, _download(symbol, start=start.isoformat()), start, lookback_days, until, meta)
+            if merged is None:
+                print(f"⚠️ [ohlcv_cache] {symbol}: догрузка не сошлась с кэшем — полная загрузка")
+        if merged is None:
+            merged = _store(symbol, None, _download(symbol, period=f"{lookback_days}d"), None, lookback_days, until)
+        if merged is None:
+            return pd.DataFrame(columns=COLUMNS)
+        return _to_frame(merged, rows)
+
+
+def load_daily_many(symbols: Iterable[str], lookback_days: int = 430, rows: int = 320) -> Dict[str, pd.DataFrame]:
+    """
+    Пакетный load_daily: свежие символы — с диска, тёплые догружаются одним пакетным запросом
+    на самый длинный разрыв, холодные (и не сошедшиеся) — пакетом на весь lookback.
+    """
+    from data.stocks import download_ohlcv_batch
+
+    until = last_close()
+    out: Dict[str, pd.DataFrame] = {}
+    with _lock:
+        plans = {}
+        for sym in symbols:
+            plans[sym] = _plan(sym, lookback_days, until)
+        warm = {s: p for s, p in plans.items() if not p[3] and p[2] is not None}
+        cold: List[str] = [s for s, p in plans.items() if not p[3] and p[2] is None]
+        for s, (arr, _, _, fresh) in plans.items():
+            if fresh:
+                out[s] = _to_frame(arr, rows)
+        from_disk = len(out)
+
+        if warm:
+            first = min(p[2] for p in warm.values())
+            gap_days = (datetime.now(timezone.utc).date() - first).days + 2
+            frames = download_ohlcv_batch(list(warm), period=f"{gap_days}d", auto_adjust=False)
+            for s, (arr, meta, start, _) in warm.items():
+                df = frames.get(s.strip().upper())
+                if df is not None:
+                    df = df[df.index >= pd.Timestamp(start).tz_localize(df.index.tz)]
+                merged = _store(s, arr, df, start, lookback_days, until, meta)
+                if merged is None:
+                    cold.append(s)
+                else:
+                    out[s] = _to_frame(merged, rows)
+
+        if cold:
+            frames = download_ohlcv_batch(cold, period=f"{lookback_days}d", auto_adjust=False)
+            for s in cold:
+                try:
+                    merged = _store(s, None, frames.get(s.strip().upper()), None, lookback_days, until)
+                except Exception:
+                    print(f"❌ [ohlcv_cache] Ошибка записи кэша для {s}:")
+                    traceback.print_exc()
+                    merged = None
+                out[s] = _to_frame(merged, rows) if merged is not None else pd.DataFrame(columns=COLUMNS)
+    print(f"✅ [ohlcv_cache] {len(out)} тикеров: с диска {from_disk}, "
+          f"догрузка {len(warm)}, полная загрузка {len(cold)}")
+    return out
@@ -1,19 +1,160 @@
 # data/stocks.py
 # Simple daily OHLCV loader for US stocks via yfinance
 from __future__ import annotations
+from typing import Dict, Iterable, List
 import pandas as pd
 import yfinance as yf
 import traceback
 
+from data import ohlcv_cache
+
 print("📄 [data/stocks] Модуль загружен")
 
-__all__ = ["load_stock_ohlcv_daily"]
+__all__ = ["load_stock_ohlcv_daily", "load_stocks_ohlcv_daily", "download_ohlcv_batch"]
+
+BATCH_CHUNK_SIZE = 100  # тикеров в одном запросе yf.download
+BATCH_THREADS = 8       # потоков yfinance внутри одного запроса
+MAX_ROWS = 320
+COLUMNS = ["open", "high", "low", "close", "volume"]
+
+
+def _empty() -> pd.DataFrame:
+    return pd.DataFrame(columns=COLUMNS)
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    out = df.rename(columns={
+        "Open": "open",
+        "High": "high",
+        "Low": "low",
+        "Close": "close",
+        "Volume": "volume"
+    })[COLUMNS].copy()
+
+    # Приведение времени к UTC
+    if out.index.tz is None:
+        out.index = out.index.tz_localize("UTC")
+    else:
+        out.index = out.index.tz_convert("UTC")
+
+    out = out.dropna()
+
+    # Ограничение до последних MAX_ROWS записей
+    if len(out) > MAX_ROWS:
+        out = out.iloc[-MAX_ROWS:]
+    return out
+
+
+def _split_by_ticker(df: pd.DataFrame, symbols: List[str]) -> Dict[str, pd.DataFrame]:
+    """
+    Разрезает ответ yf.download(group_by="ticker") на кадры по тикерам.
+    Колонки одного тикера идут подряд, поэтому iloc по срезу отдаёт view без копирования данных.
+    """
+    if not isinstance(df.columns, pd.MultiIndex):
+        # старый yfinance для одного тикера возвращает плоские колонки
+        return {symbols[0]: df} if len(symbols) == 1 else {}
+    level = 0 if set(symbols) & set(df.columns.get_level_values(0)) else 1
+    if level == 1:
+        df = df.swaplevel(axis=1).sort_index(axis=1)
+    # позиции колонок каждого тикера; get_loc на неотсортированном MultiIndex отдаёт маску, а не срез
+    spans: Dict[str, List[int]] = {}
+    for pos, sym in enumerate(df.columns.get_level_values(0)):
+        spans.setdefault(sym, []).append(pos)
+    out = {}
+    for sym in symbols:
+        pos = spans.get(sym)
+        if not pos:
+            continue
+        contiguous = pos[-1] - pos[0] + 1 == len(pos)
+        sub = df.iloc[:, slice(pos[0], pos[-1] + 1) if contiguous else pos]
+        sub.columns = sub.columns.droplevel(0)
+        # общий индекс всех тикеров: строки, где у этого тикера ничего нет, отбрасываем
+        empty_rows = sub.isna().all(axis=1)
+        if empty_rows.all():
+            continue
+        out[sym] = sub[~empty_rows] if empty_rows.any() else sub
+    return out
+
+
+def download_ohlcv_batch(symbols: Iterable[str], period: str, interval: str = "1d",
+                         chunk_size: int = BATCH_CHUNK_SIZE, threads: int = BATCH_THREADS,
+                         **kwargs) -> Dict[str, pd.DataFrame]:
+    """
+    Свечи сразу для многих тикеров: запросы по chunk_size тикеров, yfinance качает их в threads потоков.
+    Возвращает {тикер: DataFrame с колонками yfinance}; тикеров без данных в ответе нет.
+    Сами чанки идут по очереди: yf.download хранит результаты в глобальном состоянии модуля,
+    параллельные вызовы перемешали бы данные. Упавший чанк повторяется по одному тикеру.
+    """
+    symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s and s.strip()))
+    result: Dict[str, pd.DataFrame] = {}
+    for i in range(0, len(symbols), chunk_size):
+        chunk = symbols[i:i + chunk_size]
+        try:
+            df = yf.download(
+                tickers=chunk,
+                period=period,
+                interval=interval,
+                group_by="ticker",
+                threads=min(threads, len(chunk)),
+                progress=False,
+                **kwargs,
+            )
+            if df is not None and not df.empty:
+                result.update(_split_by_ticker(df, chunk))
+        except Exception:
+            print(f"❌ [stocks] Ошибка пакетной загрузки ({len(chunk)} тикеров), пробую по одному:")
+            traceback.print_exc()
+            for sym in chunk:
+                try:
+                    df = yf.download(tickers=[sym], period=period, interval=interval,
+                                     group_by="ticker", threads=False, progress=False, **kwargs)
+                    if df is not None and not df.empty:
+                        result.update(_split_by_ticker(df, [sym]))
+                except Exception:
+                    print(f"❌ [stocks] Ошибка при загрузке данных для {sym}")
+    missing = [s for s in symbols if s not in result]
+    print(f"✅ [stocks] Пакетно загружено {len(result)}/{len(symbols)} тикеров"
+          + (f", без данных: {', '.join(missing[:20])}" if missing else ""))
+    return result
+
+
+def load_stocks_ohlcv_daily(symbols: Iterable[str], lookback_days: int = 430) -> Dict[str, pd.DataFrame]:
+    """
+    Пакетный вариант load_stock_ohlcv_daily: {тикер: DataFrame [open, high, low, close, volume]}.
+    Тикеры без данных получают пустой DataFrame.
+    """
+    symbols = list(symbols)
+    if ohlcv_cache.CACHE_ENABLED:
+        try:
+            return ohlcv_cache.load_daily_many(symbols, lookback_days, rows=MAX_ROWS)
+        except Exception:
+            print("❌ [stocks] Кэш свечей недоступен, загружаю напрямую:")
+            traceback.print_exc()
+    raw = download_ohlcv_batch(symbols, period=f"{lookback_days}d", auto_adjust=False)
+    out = {}
+    for sym in symbols:
+        df = raw.get(sym.strip().upper())
+        try:
+            out[sym] = _normalize(df) if df is not None else _empty()
+        except Exception:
+            print(f"❌ [stocks] Ошибка обработки данных для {sym}:")
+            traceback.print_exc()
+            out[sym] = _empty()
+    return out
+
 
 def load_stock_ohlcv_daily(symbol: str, lookback_days: int = 430) -> pd.DataFrame:
     """
     Возвращает DataFrame с колонками [open, high, low, close, volume], индекс UTC.
     Использует Yahoo Finance daily data. Только закрытые дневные свечи.
+    Сначала смотрит локальный кэш (data/ohlcv_cache): из сети догружаются только новые бары.
     """
+    if ohlcv_cache.CACHE_ENABLED:
+        try:
+            return ohlcv_cache.load_daily(symbol, lookback_days, rows=MAX_ROWS)
+        except Exception:
+            print(f"❌ [stocks] Кэш свечей недоступен для {symbol}, загружаю напрямую:")
+            traceback.print_exc()
     try:
         print(f"🚀 [stocks] Загрузка данных для {symbol} ({lookback_days} дней)")
         df = yf.download(
@@ -26,31 +167,13 @@ def load_stock_ohlcv_daily(symbol: str, lookback_days: int = 430) -> pd.DataFram
         )
         if df is None or df.empty:
             print(f"⚠️ [stocks] Нет данных для {symbol}")
-            return pd.DataFrame(columns=["open", "high", "low", "close", "volume"])
-
-        out = df.rename(columns={
-            "Open": "open",
-            "High": "high",
-            "Low": "low",
-            "Close": "close",
-            "Volume": "volume"
-        })[["open", "high", "low", "close", "volume"]].copy()
-
-        # Приведение времени к UTC
-        if out.index.tz is None:
-            out.index = out.index.tz_localize("UTC")
-        else:
-            out.index = out.index.tz_convert("UTC")
-
-        out = out.dropna()
+            return _empty()
 
-        # Ограничение до последних 320 записей
-        if len(out) > 320:
-            out = out.iloc[-320:]
+        out = _normalize(df)
 
         print(f"✅ [stocks] Загружено {len(out)} свечей для {symbol}")
         return out
     except Exception:
         print(f"❌ [stocks] Ошибка при загрузке данных для {symbol}:")
         traceback.print_exc()
-        return pd.DataFrame(columns=["open", "high", "low", "close", "volume"])
+        return _empty()
@@ -5,22 +5,15 @@ import random
 from typing import List, Dict, Any
 import requests
 
+import tg_delivery
+
 log = logging.getLogger(__name__)
 IPO_FEED_URL = os.getenv("IPO_FEED_URL", "").strip()
 
 def _send_telegram(text: str) -> None:
-    token = (os.getenv("TELEGRAM_BOT_TOKEN") or os.getenv("BOT_TOKEN") or os.getenv("TG_BOT_TOKEN"))
-    chat_id = (os.getenv("TELEGRAM_CHAT_ID") or os.getenv("CHAT_ID") or os.getenv("TG_CHAT_ID"))
-    if not (token and chat_id):
+    # в очередь tg_delivery: отправка, лимиты и повторы — в фоне
+    if not tg_delivery.enqueue(text, source="ipo"):
         log.info("IPO: TG token/chat_id не заданы — пропускаю отправку")
-        return
-    try:
-        r = requests.post(f"https://api.telegram.org/bot{token}/sendMessage",
-                          json={"chat_id": chat_id, "text": text, "parse_mode": "HTML", "disable_web_page_preview": True},
-                          timeout=15)
-        r.raise_for_status()
-    except requests.RequestException:
-        log.exception("IPO: не удалось отправить сообщение в Telegram")
 
 def _get_json(url: str, retries: int = 3, timeout: int = 20) -> Dict[str, Any]:
     delay = 1.0
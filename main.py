@@ -4,9 +4,10 @@ import importlib
 from apscheduler.schedulers.background import BackgroundScheduler
 from telegram.ext import Updater, CommandHandler
 
-from screener_config import ScreenerConfig
+from screener_config import load_profiles
 from screener import run_screener
 import rbne_monitor  # 👈 добавлен импорт RBNE
+import tg_delivery
 
 logging.basicConfig(
     format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
@@ -83,12 +84,14 @@ def main():
         scheduler.add_job(run_reddit_monitor, "interval", hours=1, id="reddit_monitor")
 
     if ENABLE_SCREENER:
-        cfg = ScreenerConfig()
-        scheduler.add_job(lambda: run_screener(cfg), "cron", minute="*/15", id="cheap_x_screener")
+        profiles = load_profiles()
+        scheduler.add_job(lambda: run_screener(profiles), "cron", minute="*/15", id="cheap_x_screener")
 
     if ENABLE_RBNE:
         scheduler.add_job(rbne_monitor.run_once, "interval", minutes=2, id="rbne_monitor")  # 👈 RBNE-монитор каждые 2 минуты
 
+    # фоновая доставка в Telegram; заодно дошлёт то, что осталось в outbox с прошлого запуска
+    tg_delivery.start()
     scheduler.start()
     logger.info("Bot starting polling...")
     updater.start_polling(clean=True)
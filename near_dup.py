@@ -0,0 +1,122 @@
+# near_dup.py
+"""
+Поиск почти одинаковых текстов (перепечатки одного пресс-релиза, репосты) без сети.
+MinHash по словесным шинглам, LSH-бакеты по полосам сигнатуры — кандидаты ищутся
+за O(полос), а не перебором. Индекс держит только последние window_s секунд и не
+больше max_items записей, так что память ограничена.
+"""
+
+import re
+import time
+import random
+import hashlib
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+_PRIME = (1 << 61) - 1  # простое Мерсенна для универсального хэширования
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_URL_RE = re.compile(r"https?://\S+")
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+
+def shingles(text: str, k: int = 3) -> Set[str]:
+    """Словесные k-граммы нормализованного текста (без тегов, ссылок, пунктуации и регистра)."""
+    text = _URL_RE.sub(" ", _TAG_RE.sub(" ", text or "")).lower()
+    words = _NON_WORD_RE.sub(" ", text).split()
+    if len(words) <= k:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+def _hash64(s: str) -> int:
+    return int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def similarity(a: array, b: array) -> float:
+    """Оценка сходства Жаккара по двум сигнатурам."""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+class NearDupIndex:
+    """
+    add(key, sig) кладёт запись и возвращает id кластера — ключ первой похожей записи
+    (сходство >= threshold) или сам key. match(sig) только ищет.
+    Сигнатуры совместимы между индексами с одинаковыми num_perm и seed.
+    """
+
+    def __init__(self, threshold: float = 0.5, num_perm: int = 64, bands: int = 32,
+                 window_s: float = 24 * 3600, max_items: int = 2000, shingle_size: int = 3, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm должно делиться на bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.window_s = window_s
+        self.max_items = max_items
+        self.shingle_size = shingle_size
+        rnd = random.Random(seed)
+        self._perms = [(rnd.randrange(1, _PRIME), rnd.randrange(0, _PRIME)) for _ in range(num_perm)]
+        # key -> (ts, cluster, сигнатура); порядок вставки = порядок по времени
+        self._entries: "OrderedDict[str, Tuple[float, str, array]]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, int], Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def signature(self, text: str) -> Optional[array]:
+        """MinHash-сигнатура текста; None, если в тексте нет слов."""
+        hashes = [_hash64(s) for s in shingles(text, self.shingle_size)]
+        if not hashes:
+            return None
+        return array("Q", (min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms))
+
+    def _band_keys(self, sig: array) -> Iterable[Tuple[int, int]]:
+        r = self.rows
+        for i in range(self.bands):
+            yield i, hash(tuple(sig[i * r:(i + 1) * r]))
+
+    def _expire(self, now: float) -> None:
+        cutoff = now - self.window_s
+        while self._entries:
+            key, (ts, _, sig) = next(iter(self._entries.items()))
+            if ts >= cutoff and len(self._entries) <= self.max_items:
+                break
+            self._entries.popitem(last=False)
+            for bk in self._band_keys(sig):
+                bucket = self._buckets.get(bk)
+                if bucket is not None:
+                    bucket.discard(key)
+                    if not bucket:
+                        del self._buckets[bk]
+
+    def match(self, sig: Optional[array], now: Optional[float] = None) -> Optional[str]:
+        """Кластер самой похожей свежей записи или None."""
+        if sig is None:
+            return None
+        self._expire(now if now is not None else time.time())
+        candidates = set()
+        for bk in self._band_keys(sig):
+            candidates.update(self._buckets.get(bk, ()))
+        best, best_sim = None, self.threshold
+        for key in candidates:
+            _, cluster, other = self._entries[key]
+            sim = similarity(sig, other)
+            if sim >= best_sim:
+                best, best_sim = cluster, sim
+        return best
+
+    def add(self, key: str, sig: Optional[array], cluster: Optional[str] = None,
+            now: Optional[float] = None) -> str:
+        now = now if now is not None else time.time()
+        if cluster is None:
+            cluster = self.match(sig, now) or key
+        if sig is None or key in self._entries:
+            return cluster
+        self._entries[key] = (now, cluster, sig)
+        for bk in self._band_keys(sig):
+            self._buckets.setdefault(bk, set()).add(key)
+        self._expire(now)
+        return cluster
@@ -0,0 +1,83 @@
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Потокобезопасный token bucket с адаптивным замедлением (AIMD).
+    rate_per_min <= 0 — лимит отключён.
+    """
+
+    def __init__(self, rate_per_min: float, capacity: Optional[float] = None, min_rate_per_min: float = 1.0):
+        self.base_rate = max(0.0, float(rate_per_min)) / 60.0
+        self.rate = self.base_rate
+        self.min_rate = min(self.base_rate, float(min_rate_per_min) / 60.0)
+        if capacity is None:
+            capacity = max(1.0, float(rate_per_min) / 10.0)
+        self.capacity = float(capacity)
+        self._tokens = self.capacity
+        self._ts = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.base_rate > 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._ts) * self.rate)
+        self._ts = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """Неблокирующий вариант: 0 — токен взят, иначе через сколько секунд он появится."""
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Блокирует до появления токена. Возвращает, сколько секунд ждали."""
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    def penalize(self, retry_after: Optional[float] = None) -> None:
+        """Ответ 429: вдвое снижаем темп и, если сервер просит, ставим паузу."""
+        if not self.enabled:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate / 2.0)
+            self._tokens = 0.0
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + float(retry_after))
+
+    def reward(self) -> None:
+        """Успешный ответ: плавно возвращаем темп к базовому."""
+        if not self.enabled or self.rate >= self.base_rate:
+            return
+        with self._lock:
+            self.rate = min(self.base_rate, self.rate + self.base_rate / 20.0)
+
+
+def retry_after_seconds(headers, default: Optional[float] = None) -> Optional[float]:
+    raw = (headers or {}).get("Retry-After")
+    if not raw:
+        return default
+    try:
+        return max(0.0, float(raw))
+    except (TypeError, ValueError):
+        return default
@@ -1,15 +1,27 @@
 # rbne_monitor.py
 import os
+import re
 import json
 import time
 import hashlib
-from datetime import datetime, timezone, timedelta
+import queue
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timezone
 
 import feedparser
 import praw
 import requests
 from openai import OpenAI
 
+from near_dup import NearDupIndex
+import tg_delivery
+from state_store import StateStore
+from ticker_matcher import TickerMatcher
+
 # =============================
 # Конфигурация
 # =============================
@@ -20,21 +32,66 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 REDDIT_CLIENT_ID = os.getenv("REDDIT_CLIENT_ID")
 REDDIT_CLIENT_SECRET = os.getenv("REDDIT_CLIENT_SECRET")
 REDDIT_USER_AGENT = os.getenv("REDDIT_USER_AGENT", "ai-investor-bot/1.0 by rbne-monitor")
+REDDIT_SUBS = [s.strip() for s in os.getenv("RBNE_REDDIT_SUBS", "stocks,wallstreetbets,investing,stockmarket,finance").split(",") if s.strip()]
+REDDIT_CONCURRENCY = int(os.getenv("RBNE_REDDIT_CONCURRENCY", "2"))
+REDDIT_MULTI_MAX_LEN = 200  # длина "a+b+c" в одном запросе r/a+b+c
 
-# Ключевые слова для поиска
+# Список наблюдения: "ТИКЕР=Компания;ТИКЕР=Компания", по умолчанию — только RBNE
 TICKER = "RBNE"
 COMPANY = "Robin Energy"
-KEYWORDS = [TICKER, COMPANY.lower(), COMPANY]
 
-# Дедупликация
+
+def _parse_watchlist(raw: str):
+    out = []
+    for part in raw.split(";"):
+        ticker, _, company = part.partition("=")
+        ticker = ticker.strip().upper()
+        if ticker:
+            out.append((ticker, company.strip() or ticker))
+    return out
+
+
+WATCHLIST = _parse_watchlist(os.getenv("RBNE_WATCHLIST", f"{TICKER}={COMPANY}"))
+COMPANIES = dict(WATCHLIST)
+# ключевое слово -> тикер; один скомпилированный матчер маршрутизирует новость по тикерам
+KEYWORDS = {**{t: t for t, _ in WATCHLIST}, **{c: t for t, c in WATCHLIST}}
+_MATCHER = TickerMatcher(KEYWORDS)
+
+# Предел длины поискового запроса: весь список наблюдения укладывается в несколько общих запросов
+NEWS_QUERY_MAX_LEN = 400
+REDDIT_QUERY_MAX_LEN = 500
+
+# Дедупликация: отправленное хранится в SQLite (пространство rbne:seen), SEEN_PATH — старый JSON для разового переноса
 SEEN_PATH = os.getenv("RBNE_SEEN_PATH", "/tmp/rbne_seen.json")
 SEEN_TTL_HOURS = int(os.getenv("RBNE_SEEN_TTL_HOURS", "48"))
 
+# Почти-дубликаты (перепечатки, репосты): один анализ и один алерт на кластер
+DUP_THRESHOLD = float(os.getenv("RBNE_DUP_THRESHOLD", "0.5"))
+DUP_WINDOW_HOURS = int(os.getenv("RBNE_DUP_WINDOW_HOURS", "24"))
+DUP_MAX_ITEMS = int(os.getenv("RBNE_DUP_MAX_ITEMS", "2000"))
+DUP_MAX_LISTED = 10  # сколько доп. источников показывать в алерте
+
+# Кэш AI-анализа по нормализованному содержимому
+ANALYSIS_CACHE_PATH = os.getenv("RBNE_CACHE_PATH", "/tmp/rbne_cache.sqlite")
+ANALYSIS_TTL_HOURS = int(os.getenv("RBNE_ANALYSIS_TTL_HOURS", "168"))
+
+# Пакетный AI-анализ: несколько новостей в одном запросе, несколько запросов параллельно
+ANALYSIS_BATCH_SIZE = int(os.getenv("RBNE_BATCH_SIZE", "8"))
+ANALYSIS_CONCURRENCY = int(os.getenv("RBNE_LLM_CONCURRENCY", "3"))
+ANALYSIS_TOKEN_BUDGET = int(os.getenv("RBNE_TOKEN_BUDGET", "30000"))  # токенов на один прогон
+ANALYSIS_DEADLINE_S = float(os.getenv("RBNE_ANALYSIS_DEADLINE_S", "80"))  # задача идёт раз в 2 минуты
+ANALYSIS_MAX_CHARS = 2000  # на одну новость в промпте
+
 # Таймауты
 REQUEST_TIMEOUT = 20
 
+log = logging.getLogger(__name__)
+
 client = OpenAI(api_key=OPENAI_API_KEY)
 
+# отправленные кластеры за последние DUP_WINDOW_HOURS — живёт в процессе между запусками run_once
+_sent_clusters = NearDupIndex(threshold=DUP_THRESHOLD, window_s=DUP_WINDOW_HOURS * 3600, max_items=DUP_MAX_ITEMS)
+
 # =============================
 # Утилиты
 # =============================
@@ -42,130 +99,419 @@ def _now_iso():
     return datetime.now(timezone.utc).isoformat()
 
 
-def _load_seen():
-    try:
-        with open(SEEN_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        data = {}
-    # Очистка старых записей
-    cutoff = datetime.now(timezone.utc) - timedelta(hours=SEEN_TTL_HOURS)
-    fresh = {}
-    for k, v in data.items():
+def _make_id(source: str, url: str, title: str) -> str:
+    raw = f"{source}|{url}|{title}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _item_id(it) -> str:
+    return _make_id(it.get("source", "?"), it.get("url", ""), it.get("title", ""))
+
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_URL_RE = re.compile(r"https?://\S+")
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+
+def _content_hash(it) -> str:
+    # одинаковый текст с другого URL/источника даёт тот же хэш: без тегов, ссылок, пунктуации и регистра
+    body = f"{it.get('title', '')} {it.get('text', '')}"
+    body = _URL_RE.sub(" ", _TAG_RE.sub(" ", body)).lower()
+    norm = _NON_WORD_RE.sub(" ", body).strip()
+    return hashlib.sha256(norm.encode("utf-8")).hexdigest()
+
+
+def _analysis_key(it) -> str:
+    # анализ зависит и от того, про какие тикеры/компании спрашиваем: сменился список наблюдения —
+    # старый ответ для того же текста не подходит
+    tickers = sorted(it.get("tickers") or [TICKER])
+    context = ";".join(f"{t}={COMPANIES.get(t, t)}" for t in tickers)
+    return hashlib.sha256(f"{context}\n{_content_hash(it)}".encode("utf-8")).hexdigest()
+
+
+_stores = {}
+
+
+def _get_store(namespace: str) -> StateStore:
+    store = _stores.get(namespace)
+    if store is None:
+        store = _stores[namespace] = StateStore(ANALYSIS_CACHE_PATH, namespace=namespace)
+    return store
+
+
+def _get_analysis_cache():
+    return _get_store("rbne:analysis")
+
+
+def _get_seen_store() -> StateStore:
+    fresh = "rbne:seen" not in _stores
+    store = _get_store("rbne:seen")
+    if fresh:
+        _migrate_seen_json(store)
+    return store
+
+
+PURGE_INTERVAL_S = 3600
+_last_purge = 0.0
+
+
+def _purge_stores() -> None:
+    # в долгоживущем воркере истёкшие строки иначе копились бы до рестарта; раз в час, по индексу expires_at
+    global _last_purge
+    if time.monotonic() - _last_purge < PURGE_INTERVAL_S and _last_purge:
+        return
+    _last_purge = time.monotonic()
+    for ns in ("rbne:seen", "rbne:analysis", "rbne:guids"):
         try:
-            ts = datetime.fromisoformat(v.get("ts"))
+            n = _get_store(ns).purge_expired()
+            if n:
+                log.info("RBNE: %s — удалено истёкших записей: %d", ns, n)
         except Exception:
-            continue
-        if ts >= cutoff:
-            fresh[k] = v
-    if fresh != data:
-        _save_seen(fresh)
-    return fresh
+            log.warning("RBNE: очистка %s не удалась", ns, exc_info=True)
 
 
-def _save_seen(data):
+def _migrate_seen_json(store: StateStore) -> None:
+    # разовый перенос из старого rbne_seen.json с остатком TTL
+    if not os.path.exists(SEEN_PATH):
+        return
     try:
-        with open(SEEN_PATH, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False)
-    except Exception:
+        with open(SEEN_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        now = datetime.now(timezone.utc)
+        ttl = SEEN_TTL_HOURS * 3600
+        for uid, v in data.items():
+            try:
+                left = ttl - (now - datetime.fromisoformat(v.get("ts"))).total_seconds()
+            except Exception:
+                continue
+            if left > 0:
+                store.set(uid, v, ttl=left)
+    except Exception as e:
+        log.warning("перенос %s пропущен: %s", SEEN_PATH, e)
+    try:
+        os.replace(SEEN_PATH, f"{SEEN_PATH}.migrated")
+    except OSError:
         pass
 
 
-def _make_id(source: str, url: str, title: str) -> str:
-    raw = f"{source}|{url}|{title}"
-    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+def _q(term: str) -> str:
+    return f'"{term}"' if " " in term else term
+
+
+def _query_groups(clauses, joiner: str, max_len: int):
+    """Склеить условия по компаниям в как можно меньше запросов не длиннее max_len."""
+    groups, cur = [], []
+    for clause in clauses:
+        if cur and len(joiner.join(cur + [clause])) > max_len:
+            groups.append(cur)
+            cur = []
+        cur.append(clause)
+    if cur:
+        groups.append(cur)
+    return groups
+
+
+def _news_queries():
+    """[(запрос, число компаний в нём)]"""
+    clauses = []
+    for ticker, company in WATCHLIST:
+        clauses.append(f"{_q(company)} OR {ticker}" if company != ticker else ticker)
+    return [(" OR ".join(g), len(g)) for g in _query_groups(clauses, " OR ", NEWS_QUERY_MAX_LEN)]
+
+
+def _reddit_queries():
+    """[(запрос, число компаний в нём)]"""
+    clauses = []
+    for ticker, company in WATCHLIST:
+        terms = [ticker] + ([_q(company)] if company != ticker else [])
+        clauses.append(" OR ".join(f"{field}:{t}" for t in terms for field in ("title", "selftext")))
+    return [(f"({' OR '.join(g)})", len(g)) for g in _query_groups(clauses, " OR ", REDDIT_QUERY_MAX_LEN)]
+
+
+def _remember_guids(guids):
+    if guids:
+        _get_store("rbne:guids").set_many(((g, None) for g in guids), ttl=SEEN_TTL_HOURS * 3600)
+
+
+def _reset_feed_validators():
+    _pending_validators.clear()
+    validators = _get_store("rbne:feeds")
+    for feed_url in validators.items():
+        validators.delete(feed_url)
+
+
+# ETag / Last-Modified последнего прогона; в rbne:feeds пишутся только после обработки записей ленты,
+# иначе падение между загрузкой и отправкой спрятало бы эти записи за 304
+_pending_validators = {}
+
+
+def _commit_feed_validators():
+    validators = _get_store("rbne:feeds")
+    for feed_url, v in _pending_validators.items():
+        validators.set(feed_url, v)
+    _pending_validators.clear()
 
 
 # =============================
 # Источники: Reddit + Google News
 # =============================
-def fetch_reddit(limit_per_sub=15):
-    subs = [
-        "stocks",
-        "wallstreetbets",
-        "investing",
-        "stockmarket",
-        "finance",
-    ]
-    results = []
+# Клиенты praw живут между прогонами (OAuth-рукопожатие один раз); по одному на поток,
+# т.к. praw.Reddit не потокобезопасен. Не больше REDDIT_CONCURRENCY штук.
+_reddit_clients = queue.Queue()
+_reddit_created = 0
+_reddit_lock = threading.Lock()
+REDDIT_CLIENT_WAIT_S = 60  # дольше свободного клиента не ждём: queue.Empty -> поиск пропускается
 
-    if not (REDDIT_CLIENT_ID and REDDIT_CLIENT_SECRET and REDDIT_USER_AGENT):
-        return results
 
-    reddit = praw.Reddit(
-        client_id=REDDIT_CLIENT_ID,
-        client_secret=REDDIT_CLIENT_SECRET,
-        user_agent=REDDIT_USER_AGENT,
-        ratelimit_seconds=5,
-    )
+@contextmanager
+def _reddit_client():
+    global _reddit_created
+    try:
+        reddit = _reddit_clients.get_nowait()
+    except queue.Empty:
+        with _reddit_lock:
+            create = _reddit_created < max(1, REDDIT_CONCURRENCY)
+            if create:
+                _reddit_created += 1
+        if create:
+            try:
+                reddit = praw.Reddit(
+                    client_id=REDDIT_CLIENT_ID,
+                    client_secret=REDDIT_CLIENT_SECRET,
+                    user_agent=REDDIT_USER_AGENT,
+                    ratelimit_seconds=5,
+                )
+            except Exception:
+                # слот не занят — иначе после REDDIT_CONCURRENCY неудач потоки ждали бы вечно
+                with _reddit_lock:
+                    _reddit_created -= 1
+                raise
+        else:
+            reddit = _reddit_clients.get(timeout=REDDIT_CLIENT_WAIT_S)
+    try:
+        yield reddit
+    finally:
+        _reddit_clients.put(reddit)
 
-    query = f"(title:{TICKER} OR selftext:{TICKER} OR title:\"{COMPANY}\" OR selftext:\"{COMPANY}\")"
 
-    for sub in subs:
-        try:
-            for post in reddit.subreddit(sub).search(query=query, sort="new", limit=limit_per_sub):
+def _multireddits(subs):
+    """Сабреддиты склеиваются в r/a+b+c — один поиск вместо одного на каждый."""
+    return ["+".join(g) for g in _query_groups(subs, "+", REDDIT_MULTI_MAX_LEN)]
+
+
+def _search_reddit(multi: str, query: str, limit: int):
+    out = []
+    try:
+        with _reddit_client() as reddit:
+            for post in reddit.subreddit(multi).search(query=query, sort="new", limit=limit):
                 title = post.title or ""
                 text = post.selftext or ""
                 url = f"https://www.reddit.com{post.permalink}"
-                results.append({
+                out.append({
                     "source": "reddit",
-                    "sub": sub,
+                    "sub": getattr(post.subreddit, "display_name", multi),
                     "title": title,
                     "text": text,
                     "url": url,
                     "created_utc": datetime.fromtimestamp(post.created_utc, tz=timezone.utc).isoformat(),
                 })
-        except Exception:
-            continue
+    except Exception:
+        log.warning("RBNE: поиск Reddit r/%s не удался", multi, exc_info=True)
+    return out
+
+
+def fetch_reddit(limit_per_sub=15):
+    results = []
+
+    if not (REDDIT_CLIENT_ID and REDDIT_CLIENT_SECRET and REDDIT_USER_AGENT):
+        return results
+
+    tasks = []
+    for multi in _multireddits(REDDIT_SUBS):
+        n_subs = multi.count("+") + 1
+        for query, n in _reddit_queries():
+            tasks.append((multi, query, limit_per_sub * n_subs * n))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(REDDIT_CONCURRENCY, len(tasks)))) as pool:
+        for found in pool.map(lambda t: _search_reddit(*t), tasks):
+            results.extend(found)
 
     return results
 
 
+_feed_stats = Counter()  # ответы Google News за время жизни процесса: 200 / 304 / error
+
+
 def fetch_google_news(max_items=30):
-    feed_url = (
-        "https://news.google.com/rss/search?q="
-        + requests.utils.quote(f"{COMPANY} OR {TICKER}")
-        + "&hl=en-US&gl=US&ceid=US:en"
-    )
-    parsed = feedparser.parse(feed_url)
+    # один RSS-запрос на группу компаний; лимит элементов растёт с размером группы.
+    # Запрос условный (ETag / Last-Modified): на 304 нет ни тела, ни разбора.
+    validators = _get_store("rbne:feeds")
+    guids = _get_store("rbne:guids")
     items = []
-    for e in parsed.entries[:max_items]:
-        title = getattr(e, "title", "")
-        summary = getattr(e, "summary", "")
-        link = getattr(e, "link", "")
-        published = getattr(e, "published", None)
-        items.append({
-            "source": "google_news",
-            "title": title,
-            "text": summary,
-            "url": link,
-            "created_utc": published or _now_iso(),
-        })
+    run_stats = Counter()
+    _pending_validators.clear()
+    for query, n in _news_queries():
+        feed_url = (
+            "https://news.google.com/rss/search?q="
+            + requests.utils.quote(query)
+            + "&hl=en-US&gl=US&ceid=US:en"
+        )
+        v = validators.get(feed_url) or {}
+        parsed = feedparser.parse(feed_url, etag=v.get("etag"), modified=v.get("modified"))
+        status = parsed.get("status")
+        if status == 304:
+            run_stats[304] += 1
+            continue
+        if status is None or status >= 400:
+            run_stats["error"] += 1
+            continue
+        run_stats[200] += 1
+        if parsed.get("etag") or parsed.get("modified"):
+            _pending_validators[feed_url] = {"etag": parsed.get("etag"), "modified": parsed.get("modified")}
+        limit = min(100, max_items * n)
+        for e in parsed.entries[:limit]:
+            guid = e.get("id") or e.get("link")
+            if guid and guid in guids:
+                continue
+            title = getattr(e, "title", "")
+            summary = getattr(e, "summary", "")
+            link = getattr(e, "link", "")
+            published = getattr(e, "published", None)
+            items.append({
+                "source": "google_news",
+                "guid": guid,
+                "title": title,
+                "text": summary,
+                "url": link,
+                "created_utc": published or _now_iso(),
+            })
+    _feed_stats.update(run_stats)
+    total = sum(_feed_stats[k] for k in (200, 304))
+    log.info("Google News: 200=%d 304=%d error=%d за прогон; 304 — %.0f%% за %d запросов",
+             run_stats[200], run_stats[304], run_stats["error"],
+             100.0 * _feed_stats[304] / total if total else 0.0, total)
     return items
 
 
 # =============================
 # AI-анализ
 # =============================
-def analyze_news(items):
-    analyzed = []
-    for it in items:
-        body = (it.get("title", "") + "\n" + it.get("text", "")).strip()
-        prompt = (
-            "Ты — финансовый аналитик. На входе — короткая новость/пост про компанию Robin Energy (тикер RBNE). "
-            "Задача: 1) дай очень краткую выжимку (<=25 слов), 2) оцени тональность: positive/negative/neutral, "
-            "3) дай рекомендацию: buy/hold/sell, 4) укажи уверенность (0-100). Верни JSON с ключами: summary, sentiment, action, confidence.\n\n"
-            f"Текст:\n{body}"
+_FIELDS = ("summary", "sentiment", "action", "confidence")
+
+
+def _item_body(it) -> str:
+    return (it.get("title", "") + "\n" + it.get("text", "")).strip()[:ANALYSIS_MAX_CHARS]
+
+
+def _estimate_tokens(batch) -> int:
+    # грубая оценка до отправки: ~3 символа на токен + промпт и ответ
+    return 200 + sum(len(_item_body(it)) // 3 + 80 for _, it in batch)
+
+
+def _analyze_batch(batch):
+    """
+    batch — [(ключ кэша, новость)]. Один JSON-mode запрос на весь пакет,
+    ответы сопоставляются по id. Возвращает ({ключ: анализ}, потрачено токенов).
+    """
+    payload = [{"id": str(i), "tickers": it.get("tickers") or [TICKER], "text": _item_body(it)}
+               for i, (_, it) in enumerate(batch)]
+    tickers = sorted({t for p in payload for t in p["tickers"]})
+    companies = ", ".join(f"{COMPANIES.get(t, t)} (тикер {t})" for t in tickers)
+    prompt = (
+        f"Ты — финансовый аналитик. На входе — JSON-список коротких новостей/постов про компании: {companies}. "
+        "В поле tickers — о каких тикерах новость, рекомендация — по ним. "
+        "Для каждой: 1) дай очень краткую выжимку (<=25 слов), 2) оцени тональность: positive/negative/neutral, "
+        "3) дай рекомендацию: buy/hold/sell, 4) укажи уверенность (0-100). "
+        "Верни JSON вида {\"results\": [{\"id\": ..., \"summary\": ..., \"sentiment\": ..., \"action\": ..., \"confidence\": ...}]} "
+        "— ровно по одному элементу на каждый id.\n\n"
+        f"Новости:\n{json.dumps(payload, ensure_ascii=False)}"
+    )
+    t0 = time.monotonic()
+    try:
+        resp = client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.2,
+            response_format={"type": "json_object"},
         )
-        try:
-            resp = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-                response_format={"type": "json_object"},
-            )
-            data = json.loads(resp.choices[0].message.content)
-        except Exception:
+        raw = json.loads(resp.choices[0].message.content).get("results") or []
+        tokens = getattr(getattr(resp, "usage", None), "total_tokens", 0) or 0
+    except Exception:
+        log.exception("RBNE: AI-анализ пакета из %d новостей не удался", len(batch))
+        return {}, 0
+    by_id = {str(r.get("id")): r for r in raw if isinstance(r, dict)}
+    cache = _get_analysis_cache()
+    results = {}
+    for i, (key, _) in enumerate(batch):
+        r = by_id.get(str(i))
+        if not r:
+            continue
+        results[key] = {k: r[k] for k in _FIELDS if k in r}
+    cache.set_many(results.items(), ttl=ANALYSIS_TTL_HOURS * 3600)
+    log.info("RBNE: пакет %d новостей (%d разобрано) — %d токенов, %.1fs",
+             len(batch), len(results), tokens, time.monotonic() - t0)
+    return results, tokens
+
+
+def analyze_news(items, token_budget=ANALYSIS_TOKEN_BUDGET, deadline_s=ANALYSIS_DEADLINE_S):
+    """
+    Возвращает разобранные новости. Одинаковое содержимое анализируется один раз,
+    кэшированное — не анализируется вовсе. Что не уложилось в бюджет токенов или
+    дедлайн, не возвращается (и не помечается seen) — попадёт в следующий прогон.
+    """
+    cache = _get_analysis_cache()
+    results = {}
+    pending = {}
+    keys = []
+    for it in items:
+        key = _analysis_key(it)
+        keys.append(key)
+        if key in results or key in pending:
+            continue
+        data = cache.get(key)
+        if data is not None:
+            results[key] = data
+        else:
+            pending[key] = it
+
+    todo = list(pending.items())
+    batches = [todo[i:i + ANALYSIS_BATCH_SIZE] for i in range(0, len(todo), ANALYSIS_BATCH_SIZE)]
+    attempted = set()
+    spent = 0
+    t0 = time.monotonic()
+    t_end = t0 + deadline_s
+    pool = ThreadPoolExecutor(max_workers=ANALYSIS_CONCURRENCY)
+    inflight = {}
+    try:
+        while batches or inflight:
+            reserved = sum(_estimate_tokens(b) for b in inflight.values())
+            while (batches and len(inflight) < ANALYSIS_CONCURRENCY and time.monotonic() < t_end
+                   and spent + reserved + _estimate_tokens(batches[0]) <= token_budget):
+                b = batches.pop(0)
+                inflight[pool.submit(_analyze_batch, b)] = b
+                reserved += _estimate_tokens(b)
+            if not inflight:
+                break
+            done, _ = wait(inflight, timeout=max(0.0, t_end - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break  # дедлайн: незавершённые пакеты допишут кэш в фоне
+            for fut in done:
+                b = inflight.pop(fut)
+                res, tokens = fut.result()
+                spent += tokens
+                results.update(res)
+                attempted.update(key for key, _ in b)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    analyzed = []
+    deferred = 0
+    for it, key in zip(items, keys):
+        data = results.get(key)
+        if data is None:
+            if key not in attempted:
+                deferred += 1
+                continue
             data = {
                 "summary": it.get("title", "")[:120],
                 "sentiment": "neutral",
@@ -174,27 +520,39 @@ def analyze_news(items):
             }
         it.update(data)
         analyzed.append(it)
+    if pending:
+        log.info("RBNE: AI-анализ — %d новых, %d токенов, %.1fs, отложено %d",
+                 len(pending), spent, time.monotonic() - t0, deferred)
     return analyzed
 
 
 # =============================
 # Нотификации
 # =============================
-def send_telegram_message(text: str):
+def send_telegram_message(text: str, priority: float = 0.0):
+    # True — сообщение сохранено в очереди tg_delivery; склеится в дайджест и уйдёт фоновым потоком
     if not (TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID):
         return False
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    payload = {
-        "chat_id": TELEGRAM_CHAT_ID,
-        "text": text,
-        "parse_mode": "HTML",
-        "disable_web_page_preview": False,
-    }
+    return tg_delivery.enqueue_alert(text, source="rbne", priority=priority, chat_id=TELEGRAM_CHAT_ID,
+                                     token=TELEGRAM_BOT_TOKEN, disable_web_page_preview=False)
+
+
+def _format_duplicates(dups) -> str:
+    if not dups:
+        return ""
+    lines = [f"• {d.get('source', '?')}: {d.get('url', '')}" for d in dups[:DUP_MAX_LISTED]]
+    if len(dups) > DUP_MAX_LISTED:
+        lines.append(f"… и ещё {len(dups) - DUP_MAX_LISTED}")
+    return f"Также ({len(dups)}):\n" + "\n".join(lines) + "\n"
+
+
+def _priority(it) -> float:
+    # порядок в дайджесте: уверенность модели, при равной — чем больше источников, тем выше
     try:
-        r = requests.post(url, json=payload, timeout=REQUEST_TIMEOUT)
-        return r.status_code == 200
-    except Exception:
-        return False
+        conf = float(it.get("confidence", 50))
+    except (TypeError, ValueError):
+        conf = 50.0
+    return conf + len(it.get("duplicates") or []) / 100
 
 
 def format_item(it):
@@ -208,10 +566,11 @@ def format_item(it):
     created = it.get("created_utc", _now_iso())
 
     return (
-        f"<b>RBNE — новое упоминание</b>\n"
+        f"<b>{', '.join(it.get('tickers') or [TICKER])} — новое упоминание</b>\n"
         f"Источник: {source}\n"
         f"Заголовок: {title}\n"
         f"Ссылка: {url}\n"
+        f"{_format_duplicates(it.get('duplicates'))}"
         f"\n<b>AI-выжимка:</b> {summary}\n"
         f"Тональность: {sentiment}\n"
         f"Рекомендация: <b>{action.upper()}</b> ({conf}%)\n"
@@ -219,42 +578,104 @@ def format_item(it):
     )
 
 
+def _cluster_items(items):
+    """
+    Склеивает почти одинаковые элементы {uid: item}. Возвращает (представители, подавленные, сигнатуры):
+    у представителя в it["duplicates"] — остальные элементы кластера, tickers — объединение;
+    элементы, похожие на недавно отправленные кластеры, уходят в подавленные.
+    """
+    batch = NearDupIndex(threshold=DUP_THRESHOLD, max_items=max(1, len(items)))
+    sigs, clusters, suppressed = {}, {}, []
+    for uid, it in items.items():
+        sig = sigs[uid] = _sent_clusters.signature(f"{it.get('title', '')} {it.get('text', '')}")
+        if _sent_clusters.match(sig):
+            suppressed.append(it)
+            continue
+        clusters.setdefault(batch.add(uid, sig), []).append(it)
+
+    reps = []
+    for members in clusters.values():
+        # для анализа берём самый полный текст
+        rep = max(members, key=lambda m: len(m.get("text") or ""))
+        rep["duplicates"] = [m for m in members if m is not rep]
+        rep["tickers"] = sorted({t for m in members for t in m.get("tickers", [])})
+        reps.append(rep)
+    return reps, suppressed, sigs
+
+
 # =============================
 # Основной цикл разовой проверки
 # =============================
 def run_once():
-    seen = _load_seen()
+    seen = _get_seen_store()
+    _purge_stores()
 
     items = []
     items.extend(fetch_reddit())
     items.extend(fetch_google_news())
 
-    filtered = []
+    # сначала отсекаем уже виденное (одним запросом) — в LLM уходят только новые элементы
+    known = seen.existing({_item_id(it) for it in items})
+    filtered = {}
+    skipped_guids = []
     for it in items:
-        blob = (it.get("title", "") + " " + it.get("text", "")).lower()
-        if any(k.lower() in blob for k in KEYWORDS):
-            filtered.append(it)
+        uid = _item_id(it)
+        if uid in known or uid in filtered:
+            if uid in known and it.get("guid"):
+                skipped_guids.append(it["guid"])
+            continue
+        tickers = _MATCHER.find(it.get("title", "") + " " + it.get("text", ""))
+        if tickers:
+            it["tickers"] = sorted(tickers)
+            filtered[uid] = it
+    # уже отправленные записи ленты больше не разбираем; нерелевантные не запоминаем —
+    # их дешево перепроверить, а тикер, добавленный в список наблюдения, должен их найти
+    _remember_guids(skipped_guids)
 
     if not filtered:
+        _commit_feed_validators()
         return 0
 
-    analyzed = analyze_news(filtered)
+    reps, suppressed, sigs = _cluster_items(filtered)
+    ttl = SEEN_TTL_HOURS * 3600
+    if suppressed:
+        log.info("RBNE: %d почти-дубликатов уже отправленных новостей пропущено", len(suppressed))
+        seen.set_many(((_item_id(it), {"ts": _now_iso(), "url": it.get("url")}) for it in suppressed), ttl=ttl)
+    sent_guids = [it["guid"] for it in suppressed if it.get("guid")]
+
+    analyzed = analyze_news(reps)
 
     new_count = 0
     for it in analyzed:
-        uid = _make_id(it.get("source", "?"), it.get("url", ""), it.get("title", ""))
-        if uid in seen:
+        uid = _item_id(it)
+        # занимаем элемент до отправки: второй экземпляр бота на той же базе его уже не отправит
+        if not seen.claim_many([(uid, {"ts": _now_iso(), "url": it.get("url")})], ttl=ttl):
             continue
         message = format_item(it)
-        ok = send_telegram_message(message)
+        ok = send_telegram_message(message, priority=_priority(it))
         if ok:
             new_count += 1
-            seen[uid] = {"ts": _now_iso(), "url": it.get("url")}
+            members = [it] + it.get("duplicates", [])
+            seen.set_many(((_item_id(m), {"ts": _now_iso(), "url": m.get("url")}) for m in members[1:]), ttl=ttl)
+            for m in members:
+                _sent_clusters.add(_item_id(m), sigs.get(_item_id(m)), cluster=uid)
+                if m.get("guid"):
+                    sent_guids.append(m["guid"])
+        else:
+            seen.delete(uid)
+    _remember_guids(sent_guids)
+    # что-то из ленты отложено или не отправилось — следующий запрос ленты делаем безусловным,
+    # иначе 304 спрячет эти записи до следующего изменения ленты
+    sent = set(sent_guids)
+    if any(it.get("guid") and it["guid"] not in sent for it in filtered.values()):
+        _reset_feed_validators()
+    else:
+        _commit_feed_validators()
 
-    _save_seen(seen)
     return new_count
 
 
 if __name__ == "__main__":
     count = run_once()
+    tg_delivery.flush()
     print(f"RBNE monitor sent {count} new items")
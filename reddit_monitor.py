@@ -1,57 +1,129 @@
 import os
+import time
 import logging
 from collections import Counter
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import requests
 
+import tg_delivery
+from ticker_matcher import TickerMatcher
+from state_store import StateStore
+
 log = logging.getLogger(__name__)
 
 SUBREDDITS = os.getenv("SUBREDDITS", "wallstreetbets,stocks,CryptoCurrency").split(",")
 TICKERS = [t.strip().upper() for t in os.getenv("TICKERS", "GME,RBNE,BTC,ETH,NVDA,TSLA").split(",") if t.strip()]
-LIMIT = int(os.getenv("REDDIT_LIMIT", "50"))
+LIMIT = int(os.getenv("REDDIT_LIMIT", "50"))  # размер первой выборки, пока нет watermark
+PAGE_SIZE = 100  # максимум Reddit listing API
+MAX_PAGES = int(os.getenv("REDDIT_MAX_PAGES", "10"))
+WINDOW_HOURS = int(os.getenv("REDDIT_WINDOW_HOURS", "24"))
+STATE_DB = os.getenv("REDDIT_STATE_DB", "reddit_state.sqlite")
+
+_MATCHER = TickerMatcher(TICKERS)  # собирается один раз: один проход по тексту поста на все тикеры
 
 def _send_telegram(text: str) -> None:
-    token = (os.getenv("TELEGRAM_BOT_TOKEN") or os.getenv("BOT_TOKEN") or os.getenv("TG_BOT_TOKEN"))
-    chat_id = (os.getenv("TELEGRAM_CHAT_ID") or os.getenv("CHAT_ID") or os.getenv("TG_CHAT_ID"))
-    if not (token and chat_id):
+    # в очередь tg_delivery: отправка, лимиты и повторы — в фоне
+    if not tg_delivery.enqueue(text, source="reddit"):
         log.info("Reddit: TG token/chat_id не заданы — пропускаю отправку")
-        return
-    try:
-        r = requests.post(f"https://api.telegram.org/bot{token}/sendMessage",
-                          json={"chat_id": chat_id, "text": text, "parse_mode": "HTML", "disable_web_page_preview": True},
-                          timeout=15)
-        r.raise_for_status()
-    except requests.RequestException:
-        log.exception("Reddit: не удалось отправить сообщение в Telegram")
 
-def _fetch_subreddit_json(sub: str) -> List[Dict[str, Any]]:
-    url = f"https://www.reddit.com/r/{sub}/new.json?limit={LIMIT}"
+def _fetch_subreddit_json(sub: str, limit: int = LIMIT, after: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+    """Страница /new; None — запрос не удался (не путать с короткой последней страницей)."""
+    params = {"limit": limit}
+    if after:
+        params["after"] = after
     try:
-        r = requests.get(url, headers={"User-Agent": "ai-investor-bot/reddit/1.0"}, timeout=20)
+        r = requests.get(f"https://www.reddit.com/r/{sub}/new.json", params=params,
+                         headers={"User-Agent": "ai-investor-bot/reddit/1.0"}, timeout=20)
         r.raise_for_status()
         data = r.json()
         return data.get("data", {}).get("children", [])
     except requests.RequestException:
         log.exception("Reddit fetch failed for /r/%s", sub)
-        return []
+        return None
 
-def _count_tickers_in_posts(posts: List[Dict[str, Any]]) -> Counter:
-    cnt = Counter()
+def _fetch_new_posts(sub: str, watermark: Optional[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Посты новее watermark: листаем /new от свежих к старым (курсор after=fullname),
+    пока не дойдём до уже виденного поста. Без watermark — одна страница LIMIT.
+    Сравниваем и по fullname, и по времени — на случай, если пост-watermark удалили.
+    None — страница не загрузилась посреди листания или watermark не найден за MAX_PAGES страниц:
+    частичный результат отбрасываем, иначе watermark ушёл бы вперёд и посты между последней
+    загруженной страницей и ним потерялись бы навсегда. Кончился сам листинг (Reddit отдаёт ~1000
+    постов) — старше уже ничего не получить, возвращаем, что есть.
+    """
+    if not watermark:
+        return _fetch_subreddit_json(sub, limit=LIMIT)
+    wm_name = watermark.get("name")
+    wm_created = float(watermark.get("created_utc") or 0)
+    posts: List[Dict[str, Any]] = []
+    after = None
+    for _ in range(MAX_PAGES):
+        page = _fetch_subreddit_json(sub, limit=PAGE_SIZE, after=after)
+        if page is None:
+            log.warning("Reddit: /r/%s — листание прервано ошибкой, watermark не сдвигаем", sub)
+            return None
+        for p in page:
+            d = p.get("data", {})
+            if d.get("name") == wm_name or float(d.get("created_utc") or 0) <= wm_created:
+                return posts
+            posts.append(p)
+        if len(page) < PAGE_SIZE:
+            return posts
+        after = page[-1].get("data", {}).get("name")
+        if not after:
+            return posts
+    log.warning("Reddit: /r/%s — watermark не найден за %d страниц, watermark не сдвигаем "
+                "(если так каждый прогон — увеличьте REDDIT_MAX_PAGES)", sub, MAX_PAGES)
+    return None
+
+def _count_tickers_by_hour(posts: List[Dict[str, Any]]) -> Counter:
+    """Упоминания по часовым корзинам: {(час, тикер): число постов}."""
+    cnt: Counter = Counter()
     for p in posts:
         d = p.get("data", {})
-        title = (d.get("title") or "").upper()
-        selftext = (d.get("selftext") or "").upper()
-        text = f"{title} {selftext}"
-        for t in TICKERS:
-            if f"${t}" in text or f" {t} " in f" {text} ":
-                cnt[t] += 1
+        hour = int(float(d.get("created_utc") or time.time()) // 3600)
+        for t in _MATCHER.find(f"{d.get('title') or ''} {d.get('selftext') or ''}"):
+            cnt[(hour, t)] += 1
     return cnt
 
-def run_reddit_monitor():
+def _add_to_buckets(buckets: StateStore, counts: Counter) -> None:
+    ttl = (WINDOW_HOURS + 1) * 3600
+    now_hour = int(time.time() // 3600)
+    items: List[Tuple[str, int]] = []
+    for (hour, ticker), n in counts.items():
+        if hour <= now_hour - WINDOW_HOURS:
+            continue
+        key = f"{hour}:{ticker}"
+        items.append((key, buckets.get(key, 0) + n))
+    buckets.set_many(items, ttl=ttl)
+
+def _window_totals(buckets: StateStore) -> Counter:
+    since = int(time.time() // 3600) - WINDOW_HOURS
     total = Counter()
-    for sub in SUBREDDITS:
-        posts = _fetch_subreddit_json(sub.strip())
-        total.update(_count_tickers_in_posts(posts))
+    for key, n in buckets.items().items():
+        hour, ticker = key.split(":", 1)
+        if int(hour) > since:
+            total[ticker] += n
+    return total
+
+def run_reddit_monitor():
+    watermarks = StateStore(STATE_DB, namespace="reddit:watermark")
+    buckets = StateStore(STATE_DB, namespace="reddit:buckets")
+    buckets.purge_expired()
+    try:
+        for sub in SUBREDDITS:
+            sub = sub.strip()
+            posts = _fetch_new_posts(sub, watermarks.get(sub))
+            if not posts:
+                continue
+            _add_to_buckets(buckets, _count_tickers_by_hour(posts))
+            newest = max((p.get("data", {}) for p in posts), key=lambda d: float(d.get("created_utc") or 0))
+            watermarks.set(sub, {"name": newest.get("name"), "created_utc": newest.get("created_utc")})
+            log.info("Reddit: /r/%s — новых постов %d", sub, len(posts))
+        total = _window_totals(buckets)
+    finally:
+        watermarks.close()
+        buckets.close()
 
     if not total:
         log.info("Reddit: нет упоминаний по заданным тикерам")
@@ -59,7 +131,7 @@ def run_reddit_monitor():
 
     top = total.most_common(10)
     lines = [f"• <b>{t}</b>: {c}" for t, c in top]
-    text = "📈 Reddit: топ упоминаемых тикеров за ~последние посты\n" + "\n".join(lines)
+    text = f"📈 Reddit: топ упоминаемых тикеров за последние {WINDOW_HOURS} ч\n" + "\n".join(lines)
     log.info(text.replace("\n", " | "))
     _send_telegram(text)
 
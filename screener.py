@@ -1,12 +1,26 @@
 import os
+import copy
 import time
 import math
 import json
 import logging
-from typing import Dict, List, Any
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Any, FrozenSet, Iterator, Optional, Tuple, Union
 import requests
 
-from screener_config import ScreenerConfig
+try:
+    import numpy as np
+except Exception:  # без numpy работаем по-старому, монета за монетой
+    np = None
+
+from screener_config import ScreenerConfig, check_shared_settings
+from ratelimit import TokenBucket, retry_after_seconds
+import cg_cache
+import tg_delivery
+from volume_store import VolumeStore
+from state_store import StateStore
 
 logger = logging.getLogger("screener")
 logging.basicConfig(level=logging.INFO)
@@ -14,7 +28,30 @@ logging.basicConfig(level=logging.INFO)
 COINGECKO_BASE = "https://api.coingecko.com/api/v3"
 DEXSCREENER_BASE = "https://api.dexscreener.com/latest/dex"
 
-STATE_FILE = "screener_state.json"  # чтобы не спамить одинаковыми алертами
+STATE_FILE = "screener_state.json"  # старый формат, переносится в STATE_DB при первом запуске
+STATE_DB = os.getenv("SCREENER_STATE_DB", "screener_state.sqlite")  # чтобы не спамить одинаковыми алертами
+ALERT_COOLDOWN_S = 60 * 60  # не чаще раза в час
+
+_sleep = time.sleep  # replay-режим (screener_replay) подменяет на no-op
+
+# один bucket на процесс: лимит тарифа CoinGecko общий для всех прогонов
+_buckets: Dict[float, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+_volumes: Optional[VolumeStore] = None
+
+def _volume_store() -> VolumeStore:
+    global _volumes
+    if _volumes is None:
+        _volumes = VolumeStore.load()
+    return _volumes
+
+def _coingecko_bucket(cfg: ScreenerConfig) -> TokenBucket:
+    with _buckets_lock:
+        b = _buckets.get(cfg.coingecko_calls_per_min)
+        if b is None:
+            b = _buckets[cfg.coingecko_calls_per_min] = TokenBucket(cfg.coingecko_calls_per_min)
+        return b
 
 def _headers(cfg: ScreenerConfig) -> Dict[str, str]:
     h = {"accept": "application/json"}
@@ -22,18 +59,31 @@ def _headers(cfg: ScreenerConfig) -> Dict[str, str]:
         h["x-cg-pro-api-key"] = cfg.coingecko_api_key
     return h
 
-def load_state() -> Dict[str, Any]:
-    if os.path.exists(STATE_FILE):
-        try:
-            with open(STATE_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return {"last_alerted": {}}
-    return {"last_alerted": {}}
+def _alert_store(namespace: str = "screener") -> StateStore:
+    store = StateStore(STATE_DB, namespace=namespace)
+    if namespace == "screener":
+        _migrate_json_state(store)
+    store.purge_expired()
+    return store
 
-def save_state(state: Dict[str, Any]):
-    with open(STATE_FILE, "w", encoding="utf-8") as f:
-        json.dump(state, f, ensure_ascii=False, indent=2)
+def _migrate_json_state(store: StateStore) -> None:
+    # разовый перенос кулдаунов из старого screener_state.json
+    if not os.path.exists(STATE_FILE):
+        return
+    try:
+        with open(STATE_FILE, "r", encoding="utf-8") as f:
+            last_alerted = json.load(f).get("last_alerted", {})
+        now_ts = time.time()
+        for coin_key, ts in last_alerted.items():
+            left = ALERT_COOLDOWN_S - (now_ts - float(ts))
+            if left > 0:
+                store.set(coin_key, ts, ttl=left)
+    except Exception as e:
+        logger.warning(f"state migration skipped: {e}")
+    try:
+        os.replace(STATE_FILE, f"{STATE_FILE}.migrated")
+    except OSError:
+        pass
 
 def fetch_markets_page(cfg: ScreenerConfig, page: int) -> List[Dict[str, Any]]:
     params = {
@@ -45,15 +95,59 @@ def fetch_markets_page(cfg: ScreenerConfig, page: int) -> List[Dict[str, Any]]:
         "price_change_percentage": "1h,24h,7d,30d",
         "locale": "en",
     }
-    resp = requests.get(f"{COINGECKO_BASE}/coins/markets", params=params, headers=_headers(cfg), timeout=30)
-    resp.raise_for_status()
-    return resp.json()
+    url = f"{COINGECKO_BASE}/coins/markets"
+
+    def fetch():
+        resp = requests.get(url, params=params, headers=_headers(cfg), timeout=30)
+        resp.raise_for_status()
+        return resp.json()
 
-def fetch_market_chart(cfg: ScreenerConfig, coin_id: str, days: int = 7) -> Dict[str, Any]:
+    return cg_cache.get_or_fetch(url, params, fetch)
+
+def _page_max_cap(page: List[Dict[str, Any]]) -> Optional[float]:
+    # строки с пустой/нулевой капой (их у CoinGecko тысячи) в решении об остановке не участвуют
+    caps = [c.get("market_cap") for c in page if c.get("market_cap")]
+    return max(caps) if caps else None
+
+def iter_market_pages(cfg: ScreenerConfig) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Страницы /coins/markets по возрастанию капы. Останавливаемся, как только
+    капа на странице перевалила за cfg.market_cap_max: дальше капы только больше.
+    """
+    for page in range(1, cfg.coingecko_pages + 1):
+        if page > 1:
+            _sleep(1)
+        data = fetch_markets_page(cfg, page)
+        if not data:
+            return
+        yield data
+        if len(data) < cfg.coingecko_per_page:
+            return
+        max_cap = _page_max_cap(data)
+        if cfg.market_cap_max and max_cap is not None and max_cap > cfg.market_cap_max:
+            logger.info(f"markets scan stopped after page {page}: cap {max_cap:,.0f} > {cfg.market_cap_max:,}")
+            return
+
+def fetch_market_chart(cfg: ScreenerConfig, coin_id: str, days: int = 7,
+                       bucket: Optional[TokenBucket] = None) -> Dict[str, Any]:
     params = {"vs_currency": "usd", "days": days, "interval": "hourly"}
-    r = requests.get(f"{COINGECKO_BASE}/coins/{coin_id}/market_chart", params=params, headers=_headers(cfg), timeout=30)
-    r.raise_for_status()
-    return r.json()
+    url = f"{COINGECKO_BASE}/coins/{coin_id}/market_chart"
+
+    def fetch():
+        # токен лимита тратится только на реальный запрос к CoinGecko, не на попадание в кэш
+        if bucket is not None:
+            bucket.acquire()
+        r = requests.get(url, params=params, headers=_headers(cfg), timeout=30)
+        if r.status_code == 429 and bucket is not None:
+            wait = retry_after_seconds(r.headers)
+            logger.warning(f"CoinGecko 429 on {coin_id}, slowing down (retry_after={wait})")
+            bucket.penalize(wait)
+        r.raise_for_status()
+        if bucket is not None:
+            bucket.reward()
+        return r.json()
+
+    return cg_cache.get_or_fetch(url, params, fetch)
 
 def fetch_dexscreener_trending() -> List[Dict[str, Any]]:
     try:
@@ -65,6 +159,25 @@ def fetch_dexscreener_trending() -> List[Dict[str, Any]]:
         logger.warning(f"DexScreener fetch failed: {e}")
     return []
 
+def deep_volume_spike(cfg: ScreenerConfig, bucket: TokenBucket, coin_id: str, retries: int = 3,
+                      store: Optional[VolumeStore] = None) -> float:
+    if store is not None and coin_id in store:
+        return store.spike(coin_id)
+    for _ in range(retries):
+        try:
+            chart = fetch_market_chart(cfg, coin_id, days=7, bucket=bucket)
+        except requests.HTTPError as e:
+            resp = e.response
+            if resp is not None and resp.status_code == 429:
+                continue  # bucket уже замедлен в fetch_market_chart
+            return 1.0
+        except Exception:
+            return 1.0
+        if store is not None:
+            store.backfill(coin_id, chart)
+        return volume_spike_from_chart(chart)
+    return 1.0
+
 def normalize_platforms(platforms: Dict[str, Any]) -> List[str]:
     if not platforms:
         return []
@@ -74,6 +187,14 @@ def normalize_platforms(platforms: Dict[str, Any]) -> List[str]:
             names.append(k.lower())
     return names
 
+@lru_cache(maxsize=32)
+def _allowed_set(allowed: Tuple[str, ...]) -> FrozenSet[str]:
+    return frozenset(x.lower() for x in allowed)
+
+def _platform_ok(allowed: FrozenSet[str], c: Dict[str, Any]) -> bool:
+    platforms = normalize_platforms(c.get("platforms") or {})
+    return not platforms or any(p in allowed for p in platforms)
+
 def base_filters(cfg: ScreenerConfig, c: Dict[str, Any]) -> bool:
     price = c.get("current_price") or 0
     mcap = c.get("market_cap") or 0
@@ -87,12 +208,41 @@ def base_filters(cfg: ScreenerConfig, c: Dict[str, Any]) -> bool:
     if cfg.volume_min and vol < cfg.volume_min:
         return False
     if cfg.allowed_platforms:
-        platforms = normalize_platforms(c.get("platforms") or {})
-        if platforms:
-            if not any(p in platforms for p in [x.lower() for x in cfg.allowed_platforms]):
-                return False
+        if not _platform_ok(_allowed_set(tuple(cfg.allowed_platforms)), c):
+            return False
     return True
 
+def _column(rows: List[Dict[str, Any]], key: str) -> "np.ndarray":
+    return np.fromiter(((c.get(key) or 0) for c in rows), dtype=np.float64, count=len(rows))
+
+def filter_page(cfg: ScreenerConfig, page: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """base_filters для целой страницы /coins/markets: колонки numpy и маски вместо цикла по dict."""
+    if np is not None and page:
+        try:
+            price = _column(page, "current_price")
+            mask = price > 0
+            if cfg.price_max:
+                mask &= price <= cfg.price_max
+            if cfg.market_cap_max:
+                mask &= _column(page, "market_cap") <= cfg.market_cap_max
+            if cfg.volume_min:
+                mask &= _column(page, "total_volume") >= cfg.volume_min
+            idx = np.flatnonzero(mask)
+            if cfg.allowed_platforms:
+                allowed = _allowed_set(tuple(cfg.allowed_platforms))
+                return [page[i] for i in idx if _platform_ok(allowed, page[i])]
+            return [page[i] for i in idx]
+        except (TypeError, ValueError) as e:
+            logger.debug(f"vector filter fallback: {e}")
+    out = []
+    for c in page:
+        try:
+            if base_filters(cfg, c):
+                out.append(c)
+        except Exception as e:
+            logger.debug(f"skip coin: {e}")
+    return out
+
 def momentum_score(cfg: ScreenerConfig, c: Dict[str, Any], vol_spike_ratio: float = 1.0) -> float:
     ch1h = (c.get("price_change_percentage_1h_in_currency") or 0) / 100.0
     ch24 = (c.get("price_change_percentage_24h_in_currency") or 0) / 100.0
@@ -104,6 +254,20 @@ def momentum_score(cfg: ScreenerConfig, c: Dict[str, Any], vol_spike_ratio: floa
     score += max(0.0, (vol_spike_ratio - 1.0)) * 0.5
     return score
 
+def momentum_scores(cfg: ScreenerConfig, coins: List[Dict[str, Any]], vol_spikes: List[float]) -> List[float]:
+    """momentum_score для списка монет одним проходом по массивам (те же операции в том же порядке)."""
+    if np is None or not coins:
+        return [momentum_score(cfg, c, v) for c, v in zip(coins, vol_spikes)]
+    ch1h = _column(coins, "price_change_percentage_1h_in_currency") / 100.0
+    ch24 = _column(coins, "price_change_percentage_24h_in_currency") / 100.0
+    ch7d = _column(coins, "price_change_percentage_7d_in_currency") / 100.0
+    spikes = np.asarray(vol_spikes, dtype=np.float64)
+    score = ch1h * 2.0
+    score += ch24 * 1.0
+    score += ch7d * 0.5
+    score += np.maximum(0.0, spikes - 1.0) * 0.5
+    return score.tolist()
+
 def volume_spike_from_chart(chart: Dict[str, Any]) -> float:
     volumes = [v for t, v in chart.get("total_volumes", [])]
     if not volumes:
@@ -112,84 +276,61 @@ def volume_spike_from_chart(chart: Dict[str, Any]) -> float:
     avg7d = sum(volumes[:-1]) / max(1, len(volumes) - 1)
     return (last / avg7d) if avg7d > 0 else 1.0
 
-def send_telegram(token: str, chat_id: str, text: str):
+def send_telegram(token: str, chat_id: str, text: str, priority: float = 0.0):
     if not token or token.startswith("${"):
         logger.info("Telegram token not set — skip send")
         return
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    payload = {"chat_id": chat_id, "text": text, "parse_mode": "HTML", "disable_web_page_preview": True}
-    try:
-        r = requests.post(url, json=payload, timeout=15)
-        r.raise_for_status()
-    except Exception as e:
-        logger.warning(f"Telegram send failed: {e}")
-
-def run_screener(cfg: ScreenerConfig):
-    state = load_state()
-    last_alerted = state.get("last_alerted", {})
-
-    candidates: List[Dict[str, Any]] = []
-
-    # 1) тянем страницы рынков от меньшей капы
-    for page in range(1, cfg.coingecko_pages + 1):
-        data = fetch_markets_page(cfg, page)
-        for c in data:
-            try:
-                if base_filters(cfg, c):
-                    candidates.append(c)
-            except Exception as e:
-                logger.debug(f"skip coin: {e}")
-        time.sleep(1)
+    # alerts are coalesced into a digest and delivered in the background (tg_delivery),
+    # higher priority goes first when the digest has to be trimmed
+    if not tg_delivery.enqueue_alert(text, source="screener", priority=priority, chat_id=chat_id, token=token):
+        logger.warning("Telegram send failed: message not queued")
 
-    # 2) добавим горячие DEX-кандидаты (если включено)
-    if cfg.use_dexscreener:
-        try:
-            ds = fetch_dexscreener_trending()
-            for t in ds[:100]:
-                symbol = t.get("symbol") or (t.get("baseToken") or {}).get("symbol")
-                if not symbol:
-                    continue
-                c = {
-                    "id": f"dexscreener:{t.get('address','unknown')}",
-                    "symbol": symbol,
-                    "name": t.get("name", symbol),
-                    "current_price": float(t.get("priceUsd") or 0) if t.get("priceUsd") else 0,
-                    "market_cap": None,
-                    "total_volume": float(t.get("fdv") or 0) * 0.05 if t.get("fdv") else 0,
-                    "platforms": { (t.get("chainId") or ""): t.get("address") },
-                    "price_change_percentage_1h_in_currency": None,
-                    "price_change_percentage_24h_in_currency": None,
-                    "price_change_percentage_7d_in_currency": None,
-                    "_source": "dexscreener",
-                }
-                if base_filters(cfg, c):
-                    candidates.append(c)
-        except Exception as e:
-            logger.warning(f"DexScreener enrich failed: {e}")
+def _scan_config(profiles: List[ScreenerConfig]) -> ScreenerConfig:
+    # общий проход по данным: страниц — максимум по профилям, ранняя остановка — по самой большой капе;
+    # остальные настройки загрузки общие (check_shared_settings), поэтому берём их у первого профиля
+    check_shared_settings(profiles)
+    scan = copy.copy(profiles[0])
+    scan.coingecko_pages = max(p.coingecko_pages for p in profiles)
+    caps = [p.market_cap_max for p in profiles]
+    scan.market_cap_max = max(caps) if all(caps) else 0
+    return scan
 
-    # 3) топ по 24h изменению -> считаем vol spike
-    def ch24(c):
-        return c.get("price_change_percentage_24h_in_currency") or -9999
+def _dexscreener_candidates() -> List[Dict[str, Any]]:
+    out = []
+    try:
+        ds = fetch_dexscreener_trending()
+        for t in ds[:100]:
+            symbol = t.get("symbol") or (t.get("baseToken") or {}).get("symbol")
+            if not symbol:
+                continue
+            out.append({
+                "id": f"dexscreener:{t.get('address','unknown')}",
+                "symbol": symbol,
+                "name": t.get("name", symbol),
+                "current_price": float(t.get("priceUsd") or 0) if t.get("priceUsd") else 0,
+                "market_cap": None,
+                "total_volume": float(t.get("fdv") or 0) * 0.05 if t.get("fdv") else 0,
+                "platforms": { (t.get("chainId") or ""): t.get("address") },
+                "price_change_percentage_1h_in_currency": None,
+                "price_change_percentage_24h_in_currency": None,
+                "price_change_percentage_7d_in_currency": None,
+                "_source": "dexscreener",
+            })
+    except Exception as e:
+        logger.warning(f"DexScreener enrich failed: {e}")
+    return out
 
-    top = sorted(candidates, key=ch24, reverse=True)[: cfg.deep_candidates]
+def _alert_namespace(cfg: ScreenerConfig) -> str:
+    return "screener" if cfg.name == "default" else f"screener:{cfg.name}"
 
+def _shortlist(cfg: ScreenerConfig, top: List[Dict[str, Any]], spikes: Dict[str, float]) -> List[Dict[str, Any]]:
+    vol_spikes = [spikes.get(c.get("id"), 1.0) for c in top]
     scored = []
-    for c in top:
-        coin_id = c.get("id")
-        vol_spike = 1.0
-        if coin_id and not str(coin_id).startswith("dexscreener:"):
-            try:
-                chart = fetch_market_chart(cfg, coin_id, days=7)
-                vol_spike = volume_spike_from_chart(chart)
-            except Exception:
-                vol_spike = 1.0
-            time.sleep(0.5)
-        s = momentum_score(cfg, c, vol_spike)
+    for c, vol_spike, s in zip(top, vol_spikes, momentum_scores(cfg, top, vol_spikes)):
         c["_vol_spike"] = vol_spike
         c["_score"] = s
         scored.append(c)
 
-    # 4) shortlist: зона запуска
     shortlist = []
     for c in scored:
         ch1 = c.get("price_change_percentage_1h_in_currency") or 0
@@ -198,30 +339,109 @@ def run_screener(cfg: ScreenerConfig):
         if (ch1 >= cfg.min_change_1h_pct) or (ch24p >= cfg.min_change_24h_pct) or (vol_spike >= cfg.min_volume_spike_ratio):
             shortlist.append(c)
 
-    shortlist = sorted(shortlist, key=lambda x: x.get("_score", 0), reverse=True)[:20]
+    return sorted(shortlist, key=lambda x: x.get("_score", 0), reverse=True)[:20]
 
+def _send_alerts(cfg: ScreenerConfig, shortlist: List[Dict[str, Any]]) -> int:
+    alerted = _alert_store(_alert_namespace(cfg))
     alerts = []
     now_ts = time.time()
     for c in shortlist:
         coin_key = f"{(c.get('symbol') or '').upper()}::{c.get('id')}"
-        last_ts = last_alerted.get(coin_key, 0)
-        if now_ts - last_ts < 60 * 60:  # не чаще раза в час
+        if coin_key in alerted:
             continue
-        msg = format_alert(c)
-        alerts.append((coin_key, msg))
+        msg = format_alert(c, cfg)
+        alerts.append((coin_key, msg, c.get("_score", 0)))
 
     if alerts and cfg.enable_telegram_alerts:
-        for coin_key, msg in alerts:
-            send_telegram(cfg.telegram_bot_token, cfg.telegram_chat_id, msg)
-            last_alerted[coin_key] = now_ts
-        state["last_alerted"] = last_alerted
-        save_state(state)
-
-    return {
-        "checked": len(candidates),
-        "alerts": len(alerts),
-        "top_examples": [fmt_console_row(x) for x in shortlist[:5]],
-    }
+        for coin_key, msg, score in alerts:
+            send_telegram(cfg.telegram_bot_token, cfg.telegram_chat_id, msg, priority=score)
+        alerted.set_many(((k, now_ts) for k, _, _ in alerts), ttl=ALERT_COOLDOWN_S)
+    alerted.close()
+    return len(alerts)
+
+def run_screener(profiles: Union[ScreenerConfig, List[ScreenerConfig]]):
+    """
+    Один проход по данным для одного или нескольких профилей фильтров.
+    Страницы и графики тянутся один раз, кулдауны алертов у каждого профиля свои.
+    Для одного ScreenerConfig возвращает его отчёт, для списка — {имя профиля: отчёт}.
+    """
+    single = isinstance(profiles, ScreenerConfig)
+    if single:
+        profiles = [profiles]
+    t_start = time.monotonic()
+    stages: Dict[str, float] = {}
+    scan = _scan_config(profiles)
+
+    # 1) тянем страницы рынков от меньшей капы, фильтруем по мере поступления
+    # заодно обновляем локальную историю объёмов — она заменяет большинство запросов market_chart
+    store = _volume_store() if scan.use_volume_store else None
+    candidates: Dict[str, List[Dict[str, Any]]] = {p.name: [] for p in profiles}
+    for page_no, data in enumerate(iter_market_pages(scan), start=1):
+        if store is not None:
+            store.update_many(data)
+        for p in profiles:
+            if page_no <= p.coingecko_pages:
+                candidates[p.name].extend(filter_page(p, data))
+    stages["markets"] = time.monotonic() - t_start
+
+    # 2) добавим горячие DEX-кандидаты (если включено)
+    if any(p.use_dexscreener for p in profiles):
+        dex = _dexscreener_candidates()
+        for p in profiles:
+            if p.use_dexscreener:
+                try:
+                    candidates[p.name].extend(c for c in dex if base_filters(p, c))
+                except Exception as e:
+                    logger.warning(f"DexScreener enrich failed: {e}")
+
+    stages["dexscreener"] = time.monotonic() - t_start - stages["markets"]
+
+    # 3) топ по 24h изменению -> считаем vol spike (каждую монету — один раз на все профили)
+    def ch24(c):
+        return c.get("price_change_percentage_24h_in_currency") or -9999
+
+    tops = {p.name: sorted(candidates[p.name], key=ch24, reverse=True)[: p.deep_candidates] for p in profiles}
+    deep_ids = list(dict.fromkeys(
+        c.get("id") for top in tops.values() for c in top
+        if c.get("id") and not str(c.get("id")).startswith("dexscreener:")
+    ))
+
+    # графики тянем параллельно, темп держит token bucket по тарифу CoinGecko
+    t_deep = time.monotonic()
+    bucket = _coingecko_bucket(scan)
+
+    def deep(coin_id):
+        return deep_volume_spike(scan, bucket, coin_id, store=store)
+
+    with ThreadPoolExecutor(max_workers=scan.deep_workers) as pool:
+        spikes = dict(zip(deep_ids, pool.map(deep, deep_ids)))
+    deep_elapsed = time.monotonic() - t_deep
+    if store is not None:
+        store.save()
+    stages["deep"] = time.monotonic() - t_deep
+
+    # 4) shortlist и алерты — по каждому профилю отдельно
+    t_alerts = time.monotonic()
+    results = {}
+    for p in profiles:
+        shortlist = _shortlist(p, tops[p.name], spikes)
+        results[p.name] = {
+            "checked": len(candidates[p.name]),
+            "alerts": _send_alerts(p, shortlist),
+            "top_examples": [fmt_console_row(x) for x in shortlist[:5]],
+        }
+
+    stages["alerts"] = time.monotonic() - t_alerts
+    elapsed = time.monotonic() - t_start
+    logger.info(f"screener run: {elapsed:.1f}s total, deep stage {deep_elapsed:.1f}s for {len(deep_ids)} coins, "
+                f"{len(profiles)} profile(s)")
+    logger.info(f"coingecko cache: {cg_cache.stats()}")
+
+    for res in results.values():
+        res["elapsed_s"] = round(elapsed, 3)
+        res["deep_elapsed_s"] = round(deep_elapsed, 3)
+        res["stages_s"] = {k: round(v, 3) for k, v in stages.items()}
+    return results[profiles[0].name] if single else results
 
 def fmt_console_row(c: Dict[str, Any]) -> str:
     sym = (c.get("symbol") or "").upper()
@@ -233,7 +453,7 @@ def fmt_console_row(c: Dict[str, Any]) -> str:
     s = c.get("_score", 0)
     return f"{name} ({sym}) | ${price:.6f} | 1h {ch1:.2f}% | 24h {ch24p:.2f}% | 7d {ch7:.2f}% | score {s:.3f}"
 
-def format_alert(c: Dict[str, Any]) -> str:
+def format_alert(c: Dict[str, Any], cfg: Optional[ScreenerConfig] = None) -> str:
     sym = (c.get("symbol") or "").upper()
     name = c.get("name") or sym
     price = c.get("current_price") or 0
@@ -247,6 +467,8 @@ def format_alert(c: Dict[str, Any]) -> str:
         f"Спайк объёма: <b>{vol_spike:.2f}×</b> | Источник: <code>{source}</code>",
         "Фильтры: цена≤$0.10, капа≤$100M, объём≥$10M (ред.)",
     ]
+    if cfg is not None and cfg.name != "default":
+        lines.append(f"Профиль: <code>{cfg.name}</code>")
     return "\n".join(lines)
 
 if __name__ == "__main__":
@@ -1,6 +1,10 @@
 import os
+import json
+import logging
 from typing import List, Optional
 
+log = logging.getLogger("screener")
+
 class ScreenerConfig:
     def __init__(
         self,
@@ -20,7 +24,12 @@ class ScreenerConfig:
         coingecko_per_page: int = 250,
         coingecko_pages: int = 4,
         use_dexscreener: bool = True,
+        coingecko_calls_per_min: Optional[float] = None,
+        deep_workers: int = 4,
+        use_volume_store: bool = True,
+        name: str = "default",
     ):
+        self.name = str(name)
         self.price_max = float(price_max)
         self.market_cap_max = int(market_cap_max)
         self.volume_min = int(volume_min)
@@ -43,3 +52,44 @@ class ScreenerConfig:
         self.coingecko_per_page = int(coingecko_per_page)
         self.coingecko_pages = int(coingecko_pages)
         self.use_dexscreener = bool(use_dexscreener)
+        if coingecko_calls_per_min is None:
+            coingecko_calls_per_min = os.getenv("COINGECKO_CALLS_PER_MIN", "30")
+        self.coingecko_calls_per_min = float(coingecko_calls_per_min)  # <= 0 — без лимита
+        self.deep_workers = max(1, int(deep_workers))
+        self.use_volume_store = bool(use_volume_store)
+
+
+# общий проход run_screener качает данные один раз — эти настройки у всех профилей должны совпадать,
+# иначе окно страниц профиля покрывало бы не те монеты, что при отдельном запуске
+SHARED_FIELDS = ("coingecko_per_page", "coingecko_api_key", "coingecko_calls_per_min", "deep_workers",
+                 "use_volume_store")
+
+
+def check_shared_settings(profiles: List[ScreenerConfig]) -> None:
+    for field in SHARED_FIELDS:
+        values = {getattr(p, field) for p in profiles}
+        if len(values) > 1:
+            shown = "разные значения" if field == "coingecko_api_key" else sorted(values, key=str)
+            raise ValueError(f"SCREENER_PROFILES: {field} должен совпадать у всех профилей: {shown}")
+
+
+def load_profiles() -> List[ScreenerConfig]:
+    """
+    Профили скринера из ENV SCREENER_PROFILES — JSON-список аргументов ScreenerConfig, например
+    [{"name": "sol_micro", "allowed_platforms": ["solana"], "market_cap_max": 5000000},
+     {"name": "mid_any", "market_cap_max": 300000000, "price_max": 1.0}].
+    Без переменной — один профиль по умолчанию.
+    """
+    raw = os.getenv("SCREENER_PROFILES", "").strip()
+    if not raw:
+        return [ScreenerConfig()]
+    try:
+        profiles = [ScreenerConfig(**kw) for kw in json.loads(raw)]
+    except (TypeError, ValueError):
+        log.exception("SCREENER_PROFILES: не удалось разобрать — использую профиль по умолчанию")
+        return [ScreenerConfig()]
+    names = [p.name for p in profiles]
+    if len(set(names)) != len(names):
+        raise ValueError(f"SCREENER_PROFILES: имена профилей должны быть уникальны: {names}")
+    check_shared_settings(profiles)
+    return profiles or [ScreenerConfig()]
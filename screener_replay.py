@@ -0,0 +1,254 @@
+# screener_replay.py
+"""
+Офлайн-запись/воспроизведение прогонов скринера и бенчмарк run_screener.
+
+    python screener_replay.py record snapshots/2025-10-18   # живой прогон, ответы -> *.json.gz
+    python screener_replay.py replay snapshots/2025-10-18   # тот же прогон без сети и пауз
+    python screener_replay.py bench [snapshots/...] --pages 4 20 60
+
+В replay подменяются fetch_markets_page / fetch_market_chart / fetch_dexscreener_trending,
+паузы и лимиты отключены, алерты не отправляются, состояние пишется во временную папку.
+Если запрошено больше страниц, чем записано, страницы повторяются по кругу с новыми id.
+Без каталога bench генерирует синтетический снимок.
+"""
+
+import os
+import re
+import sys
+import glob
+import gzip
+import json
+import copy
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import screener
+import cg_cache
+from screener_config import ScreenerConfig, load_profiles
+from volume_store import VolumeStore
+
+
+def _safe(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+
+
+def _dump(path: str, data: Any) -> None:
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def _load(path: str) -> Any:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class Snapshot:
+    def __init__(self, path: str, tile: bool = True):
+        self.path = path
+        self.tile = tile
+        self.pages = len(glob.glob(os.path.join(path, "markets-*.json.gz")))
+        first = os.path.join(path, "markets-1.json.gz")
+        self.per_page = len(_load(first)) if os.path.exists(first) else 250
+
+    def markets(self, page: int) -> List[Dict[str, Any]]:
+        if page <= self.pages:
+            return _load(os.path.join(self.path, f"markets-{page}.json.gz"))
+        if not (self.tile and self.pages):
+            return []
+        base = (page - 1) % self.pages + 1
+        n = (page - 1) // self.pages
+        rows = []
+        for c in _load(os.path.join(self.path, f"markets-{base}.json.gz")):
+            c = dict(c)
+            c["id"] = f"{c.get('id')}~{n}"
+            rows.append(c)
+        return rows
+
+    def chart(self, coin_id: str) -> Dict[str, Any]:
+        base_id = coin_id.split("~", 1)[0]
+        return _load(os.path.join(self.path, f"chart-{_safe(base_id)}.json.gz"))
+
+    def dexscreener(self) -> List[Dict[str, Any]]:
+        path = os.path.join(self.path, "dexscreener.json.gz")
+        return _load(path) if os.path.exists(path) else []
+
+
+class _ScratchVolumeStore(VolumeStore):
+    def save(self, path: str = "") -> None:
+        pass
+
+
+@contextmanager
+def _patched(**attrs):
+    saved = {k: getattr(screener, k) for k in attrs}
+    for k, v in attrs.items():
+        setattr(screener, k, v)
+    try:
+        yield
+    finally:
+        for k, v in saved.items():
+            setattr(screener, k, v)
+
+
+def _offline(profiles: List[ScreenerConfig], **overrides) -> List[ScreenerConfig]:
+    out = []
+    for p in profiles:
+        p = copy.copy(p)
+        p.enable_telegram_alerts = False
+        for k, v in overrides.items():
+            setattr(p, k, v)
+        out.append(p)
+    return out
+
+
+def record(path: str, profiles: Optional[List[ScreenerConfig]] = None) -> Dict[str, Any]:
+    """Живой прогон (без алертов и без кэша), каждый ответ апстрима пишется в path."""
+    os.makedirs(path, exist_ok=True)
+    orig_markets = screener.fetch_markets_page
+    orig_chart = screener.fetch_market_chart
+    orig_dex = screener.fetch_dexscreener_trending
+
+    def markets(cfg, page):
+        data = orig_markets(cfg, page)
+        _dump(os.path.join(path, f"markets-{page}.json.gz"), data)
+        return data
+
+    def chart(cfg, coin_id, days=7, bucket=None):
+        data = orig_chart(cfg, coin_id, days=days, bucket=bucket)
+        _dump(os.path.join(path, f"chart-{_safe(coin_id)}.json.gz"), data)
+        return data
+
+    def dex():
+        data = orig_dex()
+        _dump(os.path.join(path, "dexscreener.json.gz"), data)
+        return data
+
+    # без volume store — чтобы в снимок попали графики всех глубоких кандидатов
+    profiles = _offline(profiles or load_profiles(), use_volume_store=False)
+    cache_enabled = cg_cache.CACHE_ENABLED
+    cg_cache.CACHE_ENABLED = False
+    try:
+        with tempfile.TemporaryDirectory() as tmp, _patched(
+            fetch_markets_page=markets, fetch_market_chart=chart, fetch_dexscreener_trending=dex,
+            STATE_DB=os.path.join(tmp, "state.sqlite"), STATE_FILE=os.path.join(tmp, "state.json"),
+        ):
+            return screener.run_screener(profiles)
+    finally:
+        cg_cache.CACHE_ENABLED = cache_enabled
+
+
+def replay(path: str, profiles: Optional[List[ScreenerConfig]] = None, **overrides) -> Dict[str, Any]:
+    """Прогон run_screener по снимку: без сети, пауз, лимитов и алертов."""
+    snap = Snapshot(path)
+
+    def chart(cfg, coin_id, days=7, bucket=None):
+        return snap.chart(coin_id)
+
+    profiles = _offline(profiles or load_profiles(), coingecko_calls_per_min=0, **overrides)
+    with tempfile.TemporaryDirectory() as tmp, _patched(
+        fetch_markets_page=lambda cfg, page: snap.markets(page),
+        fetch_market_chart=chart,
+        fetch_dexscreener_trending=snap.dexscreener,
+        _sleep=lambda s: None,
+        _volumes=_ScratchVolumeStore(),
+        STATE_DB=os.path.join(tmp, "state.sqlite"), STATE_FILE=os.path.join(tmp, "state.json"),
+    ):
+        return screener.run_screener(profiles)
+
+
+def synthesize(path: str, pages: int = 4, per_page: int = 250, seed: int = 42) -> None:
+    """Синтетический снимок: капы по возрастанию, треть строк без капы, графики на 7 суток."""
+    rnd = random.Random(seed)
+    os.makedirs(path, exist_ok=True)
+    now_ms = int(time.time() // 3600 * 3_600_000)
+    cap = 0.0
+    for page in range(1, pages + 1):
+        rows = []
+        for i in range(per_page):
+            idx = (page - 1) * per_page + i
+            if rnd.random() > 0.33:
+                cap += rnd.uniform(1e3, 1e5)
+            vol = rnd.lognormvariate(13, 2)
+            coin_id = f"coin-{idx}"
+            rows.append({
+                "id": coin_id,
+                "symbol": f"c{idx}",
+                "name": f"Coin {idx}",
+                "current_price": rnd.lognormvariate(-5, 2),
+                "market_cap": cap if cap and rnd.random() > 0.1 else None,
+                "total_volume": vol,
+                "price_change_percentage_1h_in_currency": rnd.gauss(0, 5),
+                "price_change_percentage_24h_in_currency": rnd.gauss(0, 20),
+                "price_change_percentage_7d_in_currency": rnd.gauss(0, 40),
+            })
+            _dump(os.path.join(path, f"chart-{coin_id}.json.gz"), {
+                "total_volumes": [[now_ms - h * 3_600_000, vol * rnd.uniform(0.3, 1.5)] for h in range(168, -1, -1)],
+            })
+        _dump(os.path.join(path, f"markets-{page}.json.gz"), rows)
+    _dump(os.path.join(path, "dexscreener.json.gz"), [])
+
+
+def bench(path: Optional[str] = None, page_counts=(4, 20, 60)) -> List[Dict[str, Any]]:
+    tmp = None
+    if path is None:
+        tmp = tempfile.TemporaryDirectory()
+        path = tmp.name
+        synthesize(path)
+    per_page = Snapshot(path).per_page
+    rows = []
+    try:
+        for n in page_counts:
+            # market_cap_max=0 — без ранней остановки, чтобы прогнать ровно n страниц
+            profiles = [ScreenerConfig(coingecko_pages=n, coingecko_per_page=per_page, market_cap_max=0)]
+            t0 = time.perf_counter()
+            res = replay(path, profiles)["default"]
+            wall = time.perf_counter() - t0
+            tracemalloc.start()
+            replay(path, profiles)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            rows.append({
+                "pages": n,
+                "wall_s": round(wall, 3),
+                "peak_alloc_mb": round(peak / 1e6, 2),
+                "checked": res["checked"],
+                "stages_s": res["stages_s"],
+            })
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+    return rows
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("record").add_argument("path")
+    sub.add_parser("replay").add_argument("path")
+    b = sub.add_parser("bench")
+    b.add_argument("path", nargs="?")
+    b.add_argument("--pages", type=int, nargs="+", default=[4, 20, 60])
+    args = ap.parse_args(argv)
+
+    if args.cmd == "record":
+        res = record(args.path)
+    elif args.cmd == "replay":
+        res = replay(args.path)
+    else:
+        res = bench(args.path, args.pages)
+        for r in res:
+            stages = " ".join(f"{k}={v:.3f}s" for k, v in r["stages_s"].items())
+            print(f"pages={r['pages']:>3} wall={r['wall_s']:.3f}s peak={r['peak_alloc_mb']:.1f}MB "
+                  f"checked={r['checked']} | {stages}")
+        return 0
+    print(json.dumps(res, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
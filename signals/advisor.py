@@ -3,6 +3,9 @@ import yfinance as yf
 import numpy as np
 import traceback
 
+from data.stocks import download_ohlcv_batch
+from signals.panel import advise_panel, panel_from_frames
+
 print("📄 [signals/advisor] Модуль загружен")
 
 def advise(symbol: str, interval: str = "1d", lookback: int = 60):
@@ -12,79 +15,128 @@ def advise(symbol: str, interval: str = "1d", lookback: int = 60):
     try:
         print(f"🚀 [advisor] Загрузка данных для {symbol} ({interval}, {lookback} дней)")
         df = yf.download(symbol, period=f"{lookback}d", interval=interval, progress=False)
-        if df.empty or len(df) < 3:
-            print(f"⚠️ [advisor] Недостаточно данных для {symbol}")
-            return None
-
-        df["MA20"] = df["Close"].rolling(20).mean()
-        df["MA50"] = df["Close"].rolling(50).mean()
-
-        last = df.iloc[-1]
-        prev = df.iloc[-2]
-
-        # Если скользящие средние не рассчитаны
-        if pd.isna(last["MA20"]) or pd.isna(last["MA50"]):
-            print(f"⚠️ [advisor] Скользящие средние не рассчитаны для {symbol}")
-            return None
-
-        # Определение тренда
-        if last["MA20"] > last["MA50"]:
-            trend = "up"
-        elif last["MA20"] < last["MA50"]:
-            trend = "down"
-        else:
-            trend = "flat"
-
-        # Свечной анализ
-        body = last["Close"] - last["Open"]
-        body_prev = prev["Close"] - prev["Open"]
-
-        action = "hold"
-        reason = "нет сигнала"
-
-        if trend == "up" and body > 0 and last["Close"] > prev["High"]:
-            action = "buy"
-            reason = "пробитие вершины на растущем тренде"
-        elif trend == "down" and body < 0 and last["Close"] < prev["Low"]:
-            action = "sell"
-            reason = "пробитие минимума на падающем тренде"
-        elif trend == "up" and body < 0:
-            action = "wait_pullback"
-            reason = "коррекция на растущем тренде"
-        elif trend == "down" and body > 0:
-            action = "reduce_or_exit"
-            reason = "откат на падающем тренде"
-
-        # SL/TP расчёт
-        atr = (df["High"] - df["Low"]).rolling(14).mean().iloc[-1]
-        sl = None
-        tp = None
-        rr = None
-
-        if action in ["buy", "sell"]:
-            if action == "buy":
-                sl = last["Close"] - 1.5 * atr
-                tp = last["Close"] + 3 * atr
-            elif action == "sell":
-                sl = last["Close"] + 1.5 * atr
-                tp = last["Close"] - 3 * atr
-            rr = abs(tp - last["Close"]) / abs(last["Close"] - sl) if sl != last["Close"] else None
-
-        return {
-            "symbol": symbol,
-            "trend": trend,
-            "action": action,
-            "reason": reason,
-            "sl": sl,
-            "tp": tp,
-            "rr": rr,
-            "candle_time": last.name
-        }
+        return advise_from_df(symbol, df)
     except Exception:
         print(f"❌ [advisor] Ошибка в advise() для {symbol}:")
         traceback.print_exc()
         return None
 
+
+def advise_many(symbols, interval: str = "1d", lookback: int = 60):
+    """
+    То же, что advise(), но для списка тикеров: свечи качаются пакетно (data.stocks.download_ohlcv_batch),
+    правила считаются сразу по всей панели (signals.panel).
+    Возвращает {тикер: рекомендация или None}; ошибка по одному тикеру не мешает остальным.
+    """
+    symbols = list(symbols)
+    print(f"🚀 [advisor] Пакетная загрузка данных для {len(symbols)} тикеров ({interval}, {lookback} дней)")
+    frames = download_ohlcv_batch(symbols, period=f"{lookback}d", interval=interval)
+    try:
+        recs = advise_panel(panel_from_frames(frames))
+        return {symbol: recs.get(symbol.strip().upper()) for symbol in symbols}
+    except Exception:
+        print("❌ [advisor] Ошибка панельного расчёта, считаю по одному тикеру:")
+        traceback.print_exc()
+    out = {}
+    for symbol in symbols:
+        df = frames.get(symbol.strip().upper())
+        try:
+            out[symbol] = advise_from_df(symbol, df) if df is not None else None
+        except Exception:
+            print(f"❌ [advisor] Ошибка в advise_many() для {symbol}:")
+            traceback.print_exc()
+            out[symbol] = None
+    return out
+
+
+def _decide(ma20, ma50, open_, close, prev_high, prev_low, atr):
+    """
+    Правила советника по одному бару: (trend, action, reason, sl, tp, rr).
+    Общие для advise_from_df и потоковых индикаторов (signals.streaming).
+    """
+    # Определение тренда
+    if ma20 > ma50:
+        trend = "up"
+    elif ma20 < ma50:
+        trend = "down"
+    else:
+        trend = "flat"
+
+    # Свечной анализ
+    body = close - open_
+
+    action = "hold"
+    reason = "нет сигнала"
+
+    if trend == "up" and body > 0 and close > prev_high:
+        action = "buy"
+        reason = "пробитие вершины на растущем тренде"
+    elif trend == "down" and body < 0 and close < prev_low:
+        action = "sell"
+        reason = "пробитие минимума на падающем тренде"
+    elif trend == "up" and body < 0:
+        action = "wait_pullback"
+        reason = "коррекция на растущем тренде"
+    elif trend == "down" and body > 0:
+        action = "reduce_or_exit"
+        reason = "откат на падающем тренде"
+
+    sl = None
+    tp = None
+    rr = None
+
+    if action in ["buy", "sell"]:
+        if action == "buy":
+            sl = close - 1.5 * atr
+            tp = close + 3 * atr
+        elif action == "sell":
+            sl = close + 1.5 * atr
+            tp = close - 3 * atr
+        rr = abs(tp - close) / abs(close - sl) if sl != close else None
+
+    return trend, action, reason, sl, tp, rr
+
+
+def advise_from_df(symbol: str, df: pd.DataFrame):
+    """
+    Рекомендация по уже загруженным свечам (колонки Open/High/Low/Close).
+    df не изменяется — его можно передавать как view на пакетную загрузку.
+    """
+    if df is None or df.empty or len(df) < 3:
+        print(f"⚠️ [advisor] Недостаточно данных для {symbol}")
+        return None
+
+    ma20 = df["Close"].rolling(20).mean()
+    ma50 = df["Close"].rolling(50).mean()
+
+    last = df.iloc[-1]
+    prev = df.iloc[-2]
+    last_ma20 = ma20.iloc[-1]
+    last_ma50 = ma50.iloc[-1]
+
+    # Если скользящие средние не рассчитаны
+    if pd.isna(last_ma20) or pd.isna(last_ma50):
+        print(f"⚠️ [advisor] Скользящие средние не рассчитаны для {symbol}")
+        return None
+
+    # SL/TP расчёт
+    atr = (df["High"] - df["Low"]).rolling(14).mean().iloc[-1]
+
+    trend, action, reason, sl, tp, rr = _decide(
+        last_ma20, last_ma50, last["Open"], last["Close"], prev["High"], prev["Low"], atr
+    )
+
+    return {
+        "symbol": symbol,
+        "trend": trend,
+        "action": action,
+        "reason": reason,
+        "sl": sl,
+        "tp": tp,
+        "rr": rr,
+        "candle_time": last.name
+    }
+
 def format_advice(symbol: str, timeframe: str, rec: dict) -> str:
     """Форматирование рекомендации в текст"""
     t = pd.Timestamp(rec["candle_time"]).strftime("%Y-%m-%d")
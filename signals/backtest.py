@@ -0,0 +1,184 @@
+# signals/backtest.py
+# Offline vectorized backtest of the advisor rules over cached daily OHLCV
+#
+#   python -m signals.backtest                       # все символы из кэша data/ohlcv_cache
+#   python -m signals.backtest --symbols TSLA GME --horizon 20
+#   python -m signals.backtest --synthetic 500 2520  # бенчмарк: 500 символов x 10 лет
+#   python -m signals.backtest --fetch --years 10 --symbols TSLA GME ...  # сначала залить историю в кэш
+from __future__ import annotations
+import sys
+import time
+import argparse
+from typing import Dict, Iterable, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from signals.panel import BUY, SELL, SL_ATR, TP_ATR, Panel, compute, panel_from_frames
+
+print("📄 [signals/backtest] Модуль загружен")
+
+__all__ = ["backtest", "backtest_frames", "load_cached_frames"]
+
+DEFAULT_HORIZON = 20  # баров на отработку сделки; не сработали SL/TP — выходим по закрытию
+WIN_R = TP_ATR / SL_ATR  # TP = +2R, SL = -1R
+
+
+def _forward(x: np.ndarray, horizon: int) -> np.ndarray:
+    """(символы, время, horizon): для бара t — значения баров t+1 … t+horizon (NaN за краем)."""
+    padded = np.concatenate([x[:, 1:], np.full((x.shape[0], horizon), np.nan)], axis=1)
+    return sliding_window_view(padded, horizon, axis=1)[:, : x.shape[1]]
+
+
+def _stats(r: np.ndarray, outcome: np.ndarray) -> Dict[str, float]:
+    wins = int((outcome == 1).sum())
+    losses = int((outcome == -1).sum())
+    timeouts = int((outcome == 0).sum())
+    closed = wins + losses
+    return {
+        "trades": int(len(r)),
+        "tp": wins,
+        "sl": losses,
+        "timeout": timeouts,
+        "hit_rate": round(wins / closed, 4) if closed else None,
+        "avg_r": round(float(r.mean()), 4) if len(r) else None,
+        "total_r": round(float(r.sum()), 2),
+    }
+
+
+def backtest(panel: Panel, horizon: int = DEFAULT_HORIZON) -> Dict[str, object]:
+    """
+    Правила advise() на каждом баре панели; вход по закрытию сигнального бара, уровни SL/TP как в advise().
+    Дальше смотрим high/low следующих horizon баров: первым сработавший уровень закрывает сделку,
+    если в одном баре задеты оба — считаем SL (консервативно). Без срабатывания — выход по закрытию
+    последнего бара горизонта (R по факту). Сделки, которым не хватило будущих баров, не считаются.
+    """
+    t0 = time.perf_counter()
+    res = compute(panel)
+    action, valid = res["action"], res["valid"]
+    signal = valid & ((action == BUY) | (action == SELL)) & np.isfinite(res["atr"])
+    si, ti = np.nonzero(signal)
+
+    fh = _forward(panel.high, horizon)[si, ti]
+    fl = _forward(panel.low, horizon)[si, ti]
+    fc = _forward(panel.close, horizon)[si, ti]
+    # будущих баров не хватило до конца горизонта — сделка ещё открыта
+    complete = ti + horizon < panel.close.shape[1]
+
+    is_buy = action[si, ti] == BUY
+    entry = panel.close[si, ti]
+    sl = res["sl"][si, ti][:, None]
+    tp = res["tp"][si, ti][:, None]
+    hit_tp = np.where(is_buy[:, None], fh >= tp, fl <= tp)
+    hit_sl = np.where(is_buy[:, None], fl <= sl, fh >= sl)
+    first_tp = np.where(hit_tp.any(axis=1), hit_tp.argmax(axis=1), horizon)
+    first_sl = np.where(hit_sl.any(axis=1), hit_sl.argmax(axis=1), horizon)
+
+    outcome = np.select(
+        [(first_sl < horizon) & (first_sl <= first_tp), first_tp < horizon],
+        [-1, 1],
+        0,
+    )
+    risk = np.abs(entry - sl[:, 0])
+    direction = np.where(is_buy, 1.0, -1.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        timeout_r = direction * (fc[:, -1] - entry) / risk
+    r = np.select([outcome == 1, outcome == -1], [WIN_R, -1.0], timeout_r)
+
+    keep = (complete | (outcome != 0)) & np.isfinite(r)
+    r, outcome, is_buy = r[keep], outcome[keep], is_buy[keep]
+
+    report: Dict[str, object] = {
+        "symbols": len(panel.symbols),
+        "bars": int(panel.lengths.sum()),
+        "horizon": horizon,
+        **_stats(r, outcome),
+        "buy": _stats(r[is_buy], outcome[is_buy]),
+        "sell": _stats(r[~is_buy], outcome[~is_buy]),
+        "open": int((~keep).sum()),
+    }
+    report["runtime_s"] = round(time.perf_counter() - t0, 3)
+    return report
+
+
+def backtest_frames(frames: Mapping[str, pd.DataFrame], horizon: int = DEFAULT_HORIZON) -> Dict[str, object]:
+    t0 = time.perf_counter()
+    panel = panel_from_frames(frames)
+    build_s = time.perf_counter() - t0
+    report = backtest(panel, horizon)
+    report["panel_build_s"] = round(build_s, 3)
+    return report
+
+
+def load_cached_frames(symbols: Optional[Iterable[str]] = None) -> Dict[str, pd.DataFrame]:
+    """История из локального кэша data/ohlcv_cache, без сети."""
+    from data import ohlcv_cache
+
+    frames = {}
+    for sym in symbols or ohlcv_cache.cached_symbols():
+        df = ohlcv_cache.read_cached(sym)
+        if df is not None:
+            frames[sym] = df
+    return frames
+
+
+def _synthetic(n_symbols: int, n_bars: int, seed: int = 7) -> Dict[str, pd.DataFrame]:
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end="2025-01-01", periods=n_bars, tz="UTC")
+    frames = {}
+    for i in range(n_symbols):
+        close = 50 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, n_bars)))
+        open_ = close * (1 + rng.normal(0, 0.01, n_bars))
+        spread = close * rng.uniform(0.005, 0.03, n_bars)
+        frames[f"SYN{i}"] = pd.DataFrame({
+            "Open": open_,
+            "High": np.maximum(open_, close) + spread / 2,
+            "Low": np.minimum(open_, close) - spread / 2,
+            "Close": close,
+        }, index=index)
+    return frames
+
+
+def _print_report(rep: Dict[str, object]) -> None:
+    print(f"symbols={rep['symbols']} bars={rep['bars']} horizon={rep['horizon']} "
+          f"runtime={rep['runtime_s']:.3f}s (panel {rep.get('panel_build_s', 0):.3f}s)")
+    for name, st in (("all", rep), ("buy", rep["buy"]), ("sell", rep["sell"])):
+        hit = "—" if st["hit_rate"] is None else f"{st['hit_rate']:.1%}"
+        avg = "—" if st["avg_r"] is None else f"{st['avg_r']:+.3f}R"
+        print(f"  {name:<4} trades={st['trades']:<7} TP={st['tp']:<6} SL={st['sl']:<6} "
+              f"timeout={st['timeout']:<6} hit={hit:<6} avg={avg} total={st['total_r']:+.1f}R")
+    print(f"  open (не хватило будущих баров): {rep['open']}")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Backtest advisor rules on cached daily OHLCV")
+    ap.add_argument("--symbols", nargs="+", help="по умолчанию — все символы из кэша")
+    ap.add_argument("--horizon", type=int, default=DEFAULT_HORIZON)
+    ap.add_argument("--synthetic", type=int, nargs=2, metavar=("SYMBOLS", "BARS"),
+                    help="вместо кэша — синтетическое случайное блуждание")
+    ap.add_argument("--fetch", action="store_true",
+                    help="перед прогоном догрузить в кэш историю на --years лет (нужна сеть)")
+    ap.add_argument("--years", type=float, default=10)
+    args = ap.parse_args(argv)
+
+    if args.fetch:
+        from data import ohlcv_cache
+
+        symbols = args.symbols or ohlcv_cache.cached_symbols()
+        if not symbols:
+            print("⚠️ [backtest] --fetch: укажите --symbols (кэш пуст)")
+            return 1
+        bars = ohlcv_cache.backfill(symbols, args.years)
+        print(f"✅ [backtest] В кэше история {len(bars)} символов, баров: {sum(bars.values())}")
+
+    frames = _synthetic(*args.synthetic) if args.synthetic else load_cached_frames(args.symbols)
+    if not frames:
+        print("⚠️ [backtest] Нет данных: кэш data/ohlcv_cache пуст (OHLCV_CACHE_DIR)")
+        return 1
+    _print_report(backtest_frames(frames, args.horizon))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+# signals/panel.py
+# Vectorized advisor rules over a symbols x time panel
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+print("📄 [signals/panel] Модуль загружен")
+
+__all__ = ["Panel", "panel_from_frames", "rolling_mean", "compute", "advise_panel",
+           "TRENDS", "ACTIONS", "REASONS"]
+
+TRENDS = ("flat", "up", "down")
+ACTIONS = ("hold", "buy", "sell", "wait_pullback", "reduce_or_exit")
+REASONS = {
+    "hold": "нет сигнала",
+    "buy": "пробитие вершины на растущем тренде",
+    "sell": "пробитие минимума на падающем тренде",
+    "wait_pullback": "коррекция на растущем тренде",
+    "reduce_or_exit": "откат на падающем тренде",
+}
+HOLD, BUY, SELL, WAIT_PULLBACK, REDUCE_OR_EXIT = range(len(ACTIONS))
+FLAT, UP, DOWN = range(len(TRENDS))
+
+MA_FAST, MA_SLOW, ATR_WINDOW = 20, 50, 14
+SL_ATR, TP_ATR = 1.5, 3.0
+
+
+@dataclass
+class Panel:
+    """
+    Поля OHLC формы (символы, время). Ряды выровнены по правому краю: последний бар каждого
+    символа — в последней колонке, слева недостающие бары заполнены NaN.
+    """
+    symbols: List[str]
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    lengths: np.ndarray                      # сколько реальных баров у каждого символа
+    times: List[pd.Index] = field(default_factory=list)  # индекс исходного кадра символа
+
+    @property
+    def shape(self):
+        return self.close.shape
+
+
+def panel_from_frames(frames: Mapping[str, pd.DataFrame], columns=("Open", "High", "Low", "Close")) -> Panel:
+    """Собирает панель из {символ: DataFrame} (колонки как у yfinance); пустые кадры пропускаются."""
+    symbols = [s for s, df in frames.items() if df is not None and not df.empty]
+    width = max((len(frames[s]) for s in symbols), default=0)
+    fields = {c: np.full((len(symbols), width), np.nan) for c in columns}
+    lengths = np.zeros(len(symbols), dtype=np.int64)
+    times = []
+    for i, s in enumerate(symbols):
+        df = frames[s]
+        n = len(df)
+        lengths[i] = n
+        times.append(df.index)
+        for c in columns:
+            fields[c][i, width - n:] = df[c].to_numpy(dtype="float64", na_value=np.nan)
+    o, h, l, c = (fields[k] for k in columns)
+    return Panel(symbols, o, h, l, c, lengths, times)
+
+
+def rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    """
+    Скользящее среднее по времени для панели (символы, время); NaN, пока окно не заполнено или в окне есть NaN.
+    Считает сам pandas (Kahan-суммы, серии равных значений), чтобы MA совпадали с advise() побитно:
+    у попарной суммы numpy на постоянной цене MA20 и MA50 расходятся на ulp и дают ложный тренд.
+    """
+    return pd.DataFrame(x.T).rolling(window).mean().to_numpy().T
+
+
+def _shift(x: np.ndarray) -> np.ndarray:
+    prev = np.empty_like(x)
+    prev[..., 0] = np.nan
+    prev[..., 1:] = x[..., :-1]
+    return prev
+
+
+def compute(panel: Panel) -> Dict[str, np.ndarray]:
+    """
+    Индикаторы и решения правил advise() на каждом баре панели за один проход.
+    trend/action — коды из TRENDS/ACTIONS; valid — на баре хватает истории для решения.
+    """
+    o, h, l, c = panel.open, panel.high, panel.low, panel.close
+    ma_fast = rolling_mean(c, MA_FAST)
+    ma_slow = rolling_mean(c, MA_SLOW)
+    atr = rolling_mean(h - l, ATR_WINDOW)
+    prev_high, prev_low = _shift(h), _shift(l)
+
+    trend = np.select([ma_fast > ma_slow, ma_fast < ma_slow], [UP, DOWN], FLAT)
+    body = c - o
+    up, down = trend == UP, trend == DOWN
+    action = np.select(
+        [up & (body > 0) & (c > prev_high),
+         down & (body < 0) & (c < prev_low),
+         up & (body < 0),
+         down & (body > 0)],
+        [BUY, SELL, WAIT_PULLBACK, REDUCE_OR_EXIT],
+        HOLD,
+    )
+
+    # решение есть там, где бар настоящий (не слева от начала ряда) и обе MA посчитаны
+    width = c.shape[-1]
+    real = np.arange(width) >= (width - panel.lengths)[:, None]
+    valid = real & ~np.isnan(ma_fast) & ~np.isnan(ma_slow)
+
+    direction = np.select([action == BUY, action == SELL], [1.0, -1.0], np.nan)
+    sl = c - direction * SL_ATR * atr
+    tp = c + direction * TP_ATR * atr
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rr = np.where(sl != c, np.abs(tp - c) / np.abs(c - sl), np.nan)
+    return {"ma_fast": ma_fast, "ma_slow": ma_slow, "atr": atr, "trend": trend, "action": action,
+            "valid": valid, "sl": sl, "tp": tp, "rr": rr}
+
+
+def _opt(x) -> Optional[float]:
+    return None if np.isnan(x) else x
+
+
+def advise_panel(panel: Panel, result: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, Optional[dict]]:
+    """Рекомендации по последнему бару каждого символа — те же dict, что возвращает advise()."""
+    res = result if result is not None else compute(panel)
+    out: Dict[str, Optional[dict]] = {}
+    for i, symbol in enumerate(panel.symbols):
+        if panel.lengths[i] < 3 or not res["valid"][i, -1]:
+            out[symbol] = None
+            continue
+        action = ACTIONS[res["action"][i, -1]]
+        trade = action in ("buy", "sell")
+        out[symbol] = {
+            "symbol": symbol,
+            "trend": TRENDS[res["trend"][i, -1]],
+            "action": action,
+            "reason": REASONS[action],
+            "sl": res["sl"][i, -1] if trade else None,
+            "tp": res["tp"][i, -1] if trade else None,
+            "rr": _opt(res["rr"][i, -1]) if trade else None,
+            "candle_time": panel.times[i][-1],
+        }
+    return out
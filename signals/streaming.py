@@ -0,0 +1,188 @@
+# signals/streaming.py
+# Incremental (O(1) per bar) advisor indicators for intraday intervals
+from __future__ import annotations
+import math
+from array import array
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+from signals.advisor import _decide
+
+print("📄 [signals/streaming] Модуль загружен")
+
+__all__ = ["RollingMean", "StreamingAdvisor"]
+
+NAN = float("nan")
+
+
+class RollingMean:
+    """
+    Скользящее среднее по кольцевому буферу array('d'), O(1) на значение.
+    Повторяет алгоритм pandas rolling(window).mean() (Kahan-суммы на добавление и удаление,
+    учёт NaN и серий одинаковых значений), поэтому на тех же данных результат совпадает побитно.
+    """
+    __slots__ = ("window", "buf", "head", "count", "nobs", "sum", "comp_add", "comp_remove",
+                 "neg_ct", "same_ct", "prev")
+
+    def __init__(self, window: int):
+        self.window = window
+        self.buf = array("d", [NAN]) * window
+        self.head = 0   # слот, куда ляжет следующее значение (и где лежит самое старое)
+        self.count = 0  # сколько значений видели (до window)
+        self.nobs = 0   # не-NaN значений в окне
+        self.sum = 0.0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.neg_ct = 0
+        self.same_ct = 0
+        self.prev = NAN
+
+    def _add(self, v: float) -> None:
+        if math.isnan(v):
+            return
+        self.nobs += 1
+        y = v - self.comp_add
+        t = self.sum + y
+        self.comp_add = t - self.sum - y
+        self.sum = t
+        if math.copysign(1.0, v) < 0:
+            self.neg_ct += 1
+        self.same_ct = self.same_ct + 1 if v == self.prev else 1
+        self.prev = v
+
+    def _remove(self, v: float) -> None:
+        if math.isnan(v):
+            return
+        self.nobs -= 1
+        y = -v - self.comp_remove
+        t = self.sum + y
+        self.comp_remove = t - self.sum - y
+        self.sum = t
+        if math.copysign(1.0, v) < 0:
+            self.neg_ct -= 1
+
+    def push(self, v: float) -> float:
+        v = float(v)
+        if self.count == 0:
+            self.prev = v
+        if self.count == self.window:
+            self._remove(self.buf[self.head])
+        else:
+            self.count += 1
+        self.buf[self.head] = v
+        self.head = (self.head + 1) % self.window
+        self._add(v)
+        return self.value
+
+    @property
+    def value(self) -> float:
+        if self.nobs < self.window or self.nobs <= 0:
+            return NAN
+        result = self.sum / self.nobs
+        if self.same_ct >= self.nobs:
+            return self.prev
+        if self.neg_ct == 0 and result < 0:
+            return 0.0
+        if self.neg_ct == self.nobs and result > 0:
+            return 0.0
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = {k: getattr(self, k) for k in self.__slots__ if k != "buf"}
+        d["buf"] = list(self.buf)
+        return d
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "RollingMean":
+        obj = cls(d["window"])
+        for k in cls.__slots__:
+            if k not in ("window", "buf"):
+                setattr(obj, k, d[k])
+        obj.buf = array("d", d["buf"])
+        return obj
+
+
+class StreamingAdvisor:
+    """
+    Состояние индикаторов advise() для одного символа/интервала: MA20, MA50 и ATR(14) по high-low.
+    update() принимает закрытый бар (повторы и бары не новее последнего пропускаются),
+    advice() возвращает тот же dict, что advise() на полной истории этих баров.
+    """
+
+    def __init__(self, symbol: str, interval: str = "1d"):
+        self.symbol = symbol
+        self.interval = interval
+        self.ma20 = RollingMean(20)
+        self.ma50 = RollingMean(50)
+        self.atr = RollingMean(14)
+        self.bars = 0
+        self.tz: Optional[str] = None
+        self.last: Optional[tuple] = None  # (time_ns, open, high, low, close)
+        self.prev: Optional[tuple] = None
+
+    def update(self, ts, open_: float, high: float, low: float, close: float) -> bool:
+        ts = pd.Timestamp(ts)
+        t = ts.value
+        if self.last is not None and t <= self.last[0]:
+            return False
+        self.ma20.push(close)
+        self.ma50.push(close)
+        self.atr.push(float(high) - float(low))
+        self.prev = self.last
+        self.last = (t, float(open_), float(high), float(low), float(close))
+        self.bars += 1
+        self.tz = str(ts.tz) if ts.tz is not None else None
+        return True
+
+    def update_df(self, df: pd.DataFrame) -> int:
+        """Прогнать бары кадра yfinance (Open/High/Low/Close); возвращает число принятых."""
+        n = 0
+        for ts, o, h, l, c in zip(df.index, df["Open"], df["High"], df["Low"], df["Close"]):
+            n += self.update(ts, o, h, l, c)
+        return n
+
+    def advice(self) -> Optional[dict]:
+        if self.bars < 3 or self.last is None or self.prev is None:
+            return None
+        ma20, ma50 = self.ma20.value, self.ma50.value
+        if math.isnan(ma20) or math.isnan(ma50):
+            return None
+        t, o, _, _, c = self.last
+        trend, action, reason, sl, tp, rr = _decide(ma20, ma50, o, c, self.prev[2], self.prev[3], self.atr.value)
+        return {
+            "symbol": self.symbol,
+            "trend": trend,
+            "action": action,
+            "reason": reason,
+            "sl": sl,
+            "tp": tp,
+            "rr": rr,
+            "candle_time": pd.Timestamp(t, tz="UTC").tz_convert(self.tz) if self.tz else pd.Timestamp(t),
+        }
+
+    # --- сохранение между рестартами (JSON-совместимо) ---
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "symbol": self.symbol,
+            "interval": self.interval,
+            "bars": self.bars,
+            "tz": self.tz,
+            "last": list(self.last) if self.last else None,
+            "prev": list(self.prev) if self.prev else None,
+            "ma20": self.ma20.to_dict(),
+            "ma50": self.ma50.to_dict(),
+            "atr": self.atr.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "StreamingAdvisor":
+        obj = cls(d["symbol"], d.get("interval", "1d"))
+        obj.bars = d["bars"]
+        obj.tz = d.get("tz")
+        obj.last = tuple(d["last"]) if d.get("last") else None
+        obj.prev = tuple(d["prev"]) if d.get("prev") else None
+        obj.ma20 = RollingMean.from_dict(d["ma20"])
+        obj.ma50 = RollingMean.from_dict(d["ma50"])
+        obj.atr = RollingMean.from_dict(d["atr"])
+        return obj
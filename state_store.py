@@ -0,0 +1,133 @@
+# state_store.py
+"""
+Небольшое key-value хранилище состояния поверх SQLite (WAL).
+Записи живут в пространствах имён и могут иметь срок жизни (expires_at, с индексом):
+просроченные не видны при чтении и удаляются одним DELETE по диапазону.
+Запись атомарна — падение посреди сохранения не портит состояние.
+"""
+
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+log = logging.getLogger(__name__)
+
+NO_EXPIRY = float("inf")
+
+
+class StateStore:
+    def __init__(self, path: str, namespace: str = "default"):
+        self.path = path
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            " ns TEXT NOT NULL, key TEXT NOT NULL, value TEXT,"
+            " expires_at REAL NOT NULL, PRIMARY KEY (ns, key)) WITHOUT ROWID"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS kv_expires ON kv(ns, expires_at)")
+        self._db.commit()
+
+    def _expiry(self, ttl: Optional[float], now: float) -> float:
+        return NO_EXPIRY if ttl is None else now + ttl
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM kv WHERE ns = ? AND key = ? AND expires_at > ?",
+                (self.namespace, key, time.time()),
+            ).fetchone()
+        if row is None:
+            return default
+        return json.loads(row[0]) if row[0] is not None else None
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return self._db.execute(
+                "SELECT 1 FROM kv WHERE ns = ? AND key = ? AND expires_at > ?",
+                (self.namespace, key, time.time()),
+            ).fetchone() is not None
+
+    def set(self, key: str, value: Any = None, ttl: Optional[float] = None) -> None:
+        self.set_many([(key, value)], ttl=ttl)
+
+    def set_many(self, items: Iterable[Tuple[str, Any]], ttl: Optional[float] = None) -> None:
+        now = time.time()
+        expires_at = self._expiry(ttl, now)
+        rows = [(self.namespace, k, json.dumps(v, ensure_ascii=False), expires_at) for k, v in items]
+        if not rows:
+            return
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO kv(ns, key, value, expires_at) VALUES (?, ?, ?, ?)", rows
+            )
+
+    def existing(self, keys: Iterable[str]) -> Set[str]:
+        """Какие из ключей есть (и не просрочены) — пачкой, без запроса на каждый ключ."""
+        keys = list(keys)
+        found: Set[str] = set()
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"SELECT key FROM kv WHERE ns = ? AND key IN ({marks}) AND expires_at > ?",
+                    (self.namespace, *chunk, now),
+                ).fetchall()
+                found.update(r[0] for r in rows)
+        return found
+
+    def claim_many(self, items: Iterable[Tuple[str, Any]], ttl: Optional[float] = None) -> List[str]:
+        """
+        Атомарно занять ключи, которых нет или которые просрочены; вернуть занятые.
+        Несколько процессов на одном файле не займут один ключ дважды (BEGIN IMMEDIATE).
+        """
+        now = time.time()
+        expires_at = self._expiry(ttl, now)
+        claimed = []
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for key, value in items:
+                    cur = self._db.execute(
+                        "INSERT INTO kv(ns, key, value, expires_at) VALUES (?, ?, ?, ?)"
+                        " ON CONFLICT(ns, key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at"
+                        " WHERE kv.expires_at <= ?",
+                        (self.namespace, key, json.dumps(value, ensure_ascii=False), expires_at, now),
+                    )
+                    if cur.rowcount:
+                        claimed.append(key)
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+        return claimed
+
+    def delete(self, key: str) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM kv WHERE ns = ? AND key = ?", (self.namespace, key))
+
+    def items(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, value FROM kv WHERE ns = ? AND expires_at > ?", (self.namespace, time.time())
+            ).fetchall()
+        return {k: (json.loads(v) if v is not None else None) for k, v in rows}
+
+    def purge_expired(self) -> int:
+        with self._lock, self._db:
+            cur = self._db.execute(
+                "DELETE FROM kv WHERE ns = ? AND expires_at <= ?", (self.namespace, time.time())
+            )
+        return cur.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
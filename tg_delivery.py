@@ -0,0 +1,501 @@
+# tg_delivery.py
+"""
+Единая доставка сообщений в Telegram для всех мониторов.
+enqueue() только пишет сообщение в outbox (SQLite) и сразу возвращается; отправляет фоновый
+поток через один keep-alive requests.Session. Темп держат token bucket'ы: общий (~30 msg/s)
+и на каждый чат (1 msg/s, группы и каналы — 20 в минуту). На 429 ждём parameters.retry_after,
+на сетевые ошибки и 5xx — повтор с экспоненциальной паузой. Неотправленное переживает рестарт.
+Токен бота в outbox не пишется: в строке только его отпечаток, сам токен при отправке берётся
+из памяти процесса (переданный в enqueue) или из TELEGRAM_BOT_TOKEN/BOT_TOKEN/TG_BOT_TOKEN.
+При выходе процесса очередь досылается (atexit), так что разовые скрипты не теряют сообщения.
+
+enqueue_alert() — для потоков алертов (screener, rbne): алерты копятся окно секунд на источник
+(TG_DIGEST_WINDOWS) и уходят дайджестом — по приоритету, в сообщениях до 4096 символов,
+не больше TG_DIGEST_MAX_MESSAGES штук, остаток обрезается с пометкой «…+N».
+"""
+
+import os
+import re
+import html
+import json
+import time
+import atexit
+import hashlib
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ratelimit import TokenBucket
+
+log = logging.getLogger(__name__)
+
+OUTBOX_DB = os.getenv("TG_OUTBOX_DB", "tg_outbox.sqlite")
+GLOBAL_PER_SEC = float(os.getenv("TG_GLOBAL_PER_SEC", "30"))
+CHAT_PER_SEC = float(os.getenv("TG_CHAT_PER_SEC", "1"))
+GROUP_PER_MIN = float(os.getenv("TG_GROUP_PER_MIN", "20"))
+MAX_ATTEMPTS = int(os.getenv("TG_MAX_ATTEMPTS", "8"))
+MAX_BACKOFF_S = 300
+REQUEST_TIMEOUT = 15
+
+MESSAGE_LIMIT = 4096  # символов в одном сообщении Telegram
+DIGEST_MAX_MESSAGES = int(os.getenv("TG_DIGEST_MAX_MESSAGES", "3"))
+DIGEST_SEP = "\n\n"
+
+
+def _parse_windows(raw: str) -> Dict[str, float]:
+    # "screener=30,rbne=60" -> {"screener": 30.0, "rbne": 60.0}; 0 — слать без склейки
+    out = {}
+    for part in raw.split(","):
+        name, _, val = part.partition("=")
+        if name.strip() and val.strip():
+            out[name.strip()] = float(val)
+    return out
+
+
+DIGEST_WINDOWS = _parse_windows(os.getenv("TG_DIGEST_WINDOWS", "screener=30,rbne=60"))
+
+TOKEN_ENV = ("TELEGRAM_BOT_TOKEN", "BOT_TOKEN", "TG_BOT_TOKEN")
+CHAT_ENV = ("TELEGRAM_CHAT_ID", "CHAT_ID", "TG_CHAT_ID")
+
+
+def _env_any(names) -> Optional[str]:
+    for n in names:
+        v = os.getenv(n)
+        if v:
+            return v
+    return None
+
+
+_tokens: Dict[str, str] = {}  # отпечаток -> токен бота, только в памяти
+
+
+def _token_ref(token: str) -> str:
+    ref = hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+    _tokens[ref] = token
+    return ref
+
+
+def _resolve_token(ref: str) -> Optional[str]:
+    if ref not in _tokens:
+        for name in TOKEN_ENV:
+            if os.getenv(name):
+                _token_ref(os.getenv(name))
+    return _tokens.get(ref)
+
+
+_TAG_RE = re.compile(r"<[^>]*>")
+
+
+def _plain(text: str) -> str:
+    """HTML-алерт -> текст без разметки."""
+    return html.unescape(_TAG_RE.sub("", text))
+
+
+def _truncate(text: str, limit: int, parse_mode: Optional[str]) -> str:
+    if len(text) <= limit:
+        return text
+    if parse_mode != "HTML":
+        return text[:limit - 1] + "…"
+    # обрезка посреди тега или сущности — 400 от Telegram; режем уже без разметки
+    out = html.escape(_plain(text), quote=False)
+    if len(out) <= limit:
+        return out
+    out = out[:limit - 1]
+    amp = out.rfind("&")
+    if amp != -1 and ";" not in out[amp:]:
+        out = out[:amp]
+    return out + "…"
+
+
+def pack_digest(texts: List[str], limit: int = MESSAGE_LIMIT, max_messages: int = DIGEST_MAX_MESSAGES,
+                sep: str = DIGEST_SEP, parse_mode: Optional[str] = "HTML") -> Tuple[List[str], List[str]]:
+    """
+    Склеить алерты (уже в порядке приоритета) в сообщения не длиннее limit.
+    Не влезшее в max_messages отбрасывается, в конце — пометка «…+N».
+    Возвращает (сообщения, отброшенные алерты).
+    """
+    msgs: List[List[str]] = [[]]
+    sizes = [0]
+    dropped = 0
+    removed: List[str] = []
+    for i, text in enumerate(texts):
+        text = _truncate(text, limit, parse_mode)
+        add = len(text) + (len(sep) if msgs[-1] else 0)
+        if sizes[-1] + add <= limit:
+            msgs[-1].append(text)
+            sizes[-1] += add
+        elif len(msgs) < max_messages:
+            msgs.append([text])
+            sizes.append(len(text))
+        else:
+            dropped = len(texts) - i
+            removed = list(texts[i:])
+            break
+    if dropped:
+        last = msgs[-1]
+        while last and sizes[-1] + len(sep) + len(f"…+{dropped}") > limit:
+            popped = last.pop()
+            sizes[-1] -= len(popped) + (len(sep) if last else 0)
+            removed.insert(0, popped)
+            dropped += 1
+        last.append(f"…+{dropped}")
+    return [sep.join(m) for m in msgs if m], removed
+
+
+class Outbox:
+    """
+    Очередь сообщений в SQLite (WAL): строка удаляется только после успешной отправки.
+    bot — отпечаток токена (_token_ref), не сам токен.
+    """
+
+    def __init__(self, path: str = OUTBOX_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, bot TEXT NOT NULL, chat_id TEXT NOT NULL,"
+            " payload TEXT NOT NULL, source TEXT, attempts INTEGER NOT NULL DEFAULT 0,"
+            " not_before REAL NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox(not_before)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS outbox_chat ON outbox(chat_id, id)")
+        # алерты, ждущие склейки в дайджест; группа — (bot, chat_id, source, parse_mode, preview)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS digest ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, bot TEXT NOT NULL, chat_id TEXT NOT NULL,"
+            " source TEXT NOT NULL, parse_mode TEXT NOT NULL, preview INTEGER NOT NULL,"
+            " priority REAL NOT NULL, text TEXT NOT NULL, flush_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def _insert(self, bot: str, chat_id: str, payload: Dict[str, Any], source: str, now: float) -> int:
+        return self._db.execute(
+            "INSERT INTO outbox(bot, chat_id, payload, source, not_before, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (bot, str(chat_id), json.dumps(payload, ensure_ascii=False), source, now, now),
+        ).lastrowid
+
+    def put(self, bot: str, chat_id: str, payload: Dict[str, Any], source: str = "") -> int:
+        with self._lock, self._db:
+            return self._insert(bot, chat_id, payload, source, time.time())
+
+    def put_alert(self, bot: str, chat_id: str, source: str, parse_mode: Optional[str], preview: bool,
+                  priority: float, text: str, window: float) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO digest(bot, chat_id, source, parse_mode, preview, priority, text, flush_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (bot, str(chat_id), source, parse_mode or "", int(preview), float(priority), text,
+                 time.time() + window),
+            )
+
+    def flush_digests(self, force: bool = False) -> int:
+        """Группы, у которых истекло окно (force — все), склеить и переложить в outbox. Возвращает число сообщений."""
+        now = time.time()
+        made = 0
+        with self._lock, self._db:
+            groups = self._db.execute(
+                "SELECT bot, chat_id, source, parse_mode, preview FROM digest"
+                " GROUP BY bot, chat_id, source, parse_mode, preview HAVING MIN(flush_at) <= ?",
+                (float("inf") if force else now,),
+            ).fetchall()
+            for bot, chat_id, source, parse_mode, preview in groups:
+                rows = self._db.execute(
+                    "SELECT id, text FROM digest WHERE bot = ? AND chat_id = ? AND source = ?"
+                    " AND parse_mode = ? AND preview = ? ORDER BY priority DESC, id",
+                    (bot, chat_id, source, parse_mode, preview),
+                ).fetchall()
+                messages, removed = pack_digest([r[1] for r in rows], parse_mode=parse_mode or None)
+                if removed:
+                    # источник уже считает их отправленными — оставляем след в логе
+                    log.warning("TG delivery: дайджест %s переполнен, не отправлено %d алертов: %s", source,
+                                len(removed), "; ".join(_plain(t).strip().split("\n")[0][:80] for t in removed))
+                for text in messages:
+                    payload: Dict[str, Any] = {"text": text, "disable_web_page_preview": bool(preview)}
+                    if parse_mode:
+                        payload["parse_mode"] = parse_mode
+                    self._insert(bot, chat_id, payload, source, now)
+                    made += 1
+                self._db.executemany("DELETE FROM digest WHERE id = ?", [(r[0],) for r in rows])
+        return made
+
+    def next_digest(self) -> Optional[float]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MIN(f) FROM (SELECT MIN(flush_at) AS f FROM digest"
+                " GROUP BY bot, chat_id, source, parse_mode, preview)"
+            ).fetchone()
+        return row[0] if row else None
+
+    def pending_alerts(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM digest").fetchone()[0]
+
+    def due(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Готовые к отправке; сообщение не обгоняет более раннее в тот же чат, ждущее повтора."""
+        now = time.time()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, bot, chat_id, payload, source, attempts FROM outbox AS m"
+                " WHERE not_before <= ? AND NOT EXISTS ("
+                "  SELECT 1 FROM outbox AS e WHERE e.chat_id = m.chat_id AND e.id < m.id AND e.not_before > ?)"
+                " ORDER BY id LIMIT ?", (now, now, limit)
+            ).fetchall()
+        return [
+            {"id": r[0], "bot": r[1], "chat_id": r[2], "payload": json.loads(r[3]), "source": r[4], "attempts": r[5]}
+            for r in rows
+        ]
+
+    def next_due(self) -> Optional[float]:
+        with self._lock:
+            row = self._db.execute("SELECT MIN(not_before) FROM outbox").fetchone()
+        return row[0] if row else None
+
+    def done(self, msg_id: int) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM outbox WHERE id = ?", (msg_id,))
+
+    def retry(self, msg_id: int, delay: float, count_attempt: bool = True) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE outbox SET not_before = ?, attempts = attempts + ? WHERE id = ?",
+                (time.time() + delay, 1 if count_attempt else 0, msg_id),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+
+class Delivery:
+    def __init__(self, path: str = OUTBOX_DB):
+        self.outbox = Outbox(path)
+        self._session = requests.Session()
+        self._session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+        self._global = TokenBucket(GLOBAL_PER_SEC * 60, capacity=GLOBAL_PER_SEC)
+        self._chats: Dict[str, TokenBucket] = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._idle = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            # отрицательный id — группа или канал, у Telegram для них лимит строже
+            per_min = GROUP_PER_MIN if chat_id.startswith("-") else CHAT_PER_SEC * 60
+            bucket = self._chats[chat_id] = TokenBucket(per_min, capacity=1)
+        return bucket
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="tg-delivery", daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def enqueue(self, payload: Dict[str, Any], token: str, chat_id: str, source: str = "") -> int:
+        msg_id = self.outbox.put(_token_ref(token), chat_id, payload, source)
+        self._idle.clear()
+        self.start()
+        self._wake.set()
+        return msg_id
+
+    def enqueue_alert(self, text: str, token: str, chat_id: str, source: str, parse_mode: Optional[str],
+                      preview: bool, priority: float, window: float) -> None:
+        self.outbox.put_alert(_token_ref(token), chat_id, source, parse_mode, preview, priority, text, window)
+        self._idle.clear()
+        self.start()
+        self._wake.set()
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """Подождать, пока outbox опустеет (для разовых скриптов перед выходом); дайджесты — без ожидания окна."""
+        if self.outbox.flush_digests(force=True):
+            self.start()
+            self._wake.set()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not len(self.outbox):
+                return True
+            self._idle.wait(min(0.5, max(0.0, deadline - time.monotonic())))
+        return not len(self.outbox)
+
+    # --- фоновый поток ---
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                wait = self._drain()
+            except Exception:
+                log.exception("TG delivery: ошибка в цикле отправки")
+                wait = 5.0
+            if wait is None:
+                self._idle.set()
+                wait = 60.0
+            self._wake.wait(wait)
+            self._wake.clear()
+
+    def _drain(self) -> Optional[float]:
+        """Отправить всё, что можно прямо сейчас; вернуть, через сколько секунд смотреть снова."""
+        self.outbox.flush_digests()
+        rows = self.outbox.due()
+        soonest = None
+        blocked = set()  # чат упёрся в лимит — его следующие сообщения не обгоняют текущее
+        for row in rows:
+            chat = row["chat_id"]
+            if chat in blocked:
+                continue
+            wait = self._chat_bucket(chat).try_acquire()
+            if wait:
+                blocked.add(chat)
+                soonest = wait if soonest is None else min(soonest, wait)
+                continue
+            self._global.acquire()
+            if not self._send(row):
+                blocked.add(chat)
+        for nxt in (self.outbox.next_due(), self.outbox.next_digest()):
+            if nxt is not None:
+                delay = max(0.05, nxt - time.time())
+                soonest = delay if soonest is None else min(soonest, delay)
+        return soonest
+
+    def _send(self, row: Dict[str, Any]) -> bool:
+        chat = row["chat_id"]
+        bucket = self._chat_bucket(chat)
+        token = _resolve_token(row["bot"])
+        if token is None:
+            # сообщение из прошлого запуска с другим токеном, которого в этом процессе нет
+            self._retry(row, "токен бота не найден")
+            return False
+        url = f"https://api.telegram.org/bot{token}/sendMessage"
+        payload = dict(row["payload"], chat_id=chat)
+        try:
+            r = self._session.post(url, json=payload, timeout=REQUEST_TIMEOUT)
+        except requests.RequestException as e:
+            self._retry(row, f"сеть: {e}")
+            return False
+        if r.status_code == 200:
+            self.outbox.done(row["id"])
+            bucket.reward()
+            self.sent += 1
+            return True
+        try:
+            body = r.json()
+        except ValueError:
+            body = {}
+        if r.status_code == 429:
+            retry_after = float((body.get("parameters") or {}).get("retry_after") or 1)
+            log.warning("TG delivery: 429 для чата %s, retry_after=%ss", chat, retry_after)
+            bucket.penalize(retry_after)
+            self.outbox.retry(row["id"], retry_after, count_attempt=False)
+            return False
+        if r.status_code >= 500:
+            self._retry(row, f"HTTP {r.status_code}")
+            return False
+        # 400/401/403 и т.п. — повтор не поможет
+        log.error("TG delivery: сообщение %s (%s) отброшено: HTTP %s %s",
+                  row["id"], row["source"], r.status_code, body.get("description", ""))
+        self.outbox.done(row["id"])
+        self.failed += 1
+        return True
+
+    def _retry(self, row: Dict[str, Any], reason: str) -> None:
+        attempts = row["attempts"] + 1
+        if attempts >= MAX_ATTEMPTS:
+            log.error("TG delivery: сообщение %s (%s) отброшено после %d попыток: %s",
+                      row["id"], row["source"], attempts, reason)
+            self.outbox.done(row["id"])
+            self.failed += 1
+            return
+        delay = min(MAX_BACKOFF_S, 2 ** attempts)
+        log.warning("TG delivery: %s — повтор сообщения %s через %ss", reason, row["id"], delay)
+        self.outbox.retry(row["id"], delay)
+
+
+_delivery: Optional[Delivery] = None
+_delivery_lock = threading.Lock()
+
+
+def get_delivery() -> Delivery:
+    global _delivery
+    with _delivery_lock:
+        if _delivery is None:
+            _delivery = Delivery()
+            # разовые скрипты: фоновый поток daemon и умрёт вместе с процессом — досылаем до выхода
+            atexit.register(_flush_at_exit)
+        return _delivery
+
+
+def start() -> None:
+    """Запустить фоновую отправку (и дослать то, что осталось в outbox с прошлого запуска)."""
+    get_delivery().start()
+
+
+def enqueue(text: str, chat_id: Optional[str] = None, token: Optional[str] = None, parse_mode: Optional[str] = "HTML",
+            disable_web_page_preview: bool = True, source: str = "") -> bool:
+    """
+    Поставить сообщение в очередь. True — сообщение сохранено в outbox и будет отправлено;
+    False — не заданы токен/чат или outbox недоступен. Сеть здесь не трогается.
+    token/chat_id по умолчанию — из TELEGRAM_BOT_TOKEN/BOT_TOKEN/TG_BOT_TOKEN и TELEGRAM_CHAT_ID/CHAT_ID/TG_CHAT_ID.
+    """
+    token = token or _env_any(TOKEN_ENV)
+    chat_id = chat_id or _env_any(CHAT_ENV)
+    if not (token and chat_id):
+        return False
+    payload: Dict[str, Any] = {"text": text, "disable_web_page_preview": disable_web_page_preview}
+    if parse_mode:
+        payload["parse_mode"] = parse_mode
+    try:
+        get_delivery().enqueue(payload, token, str(chat_id), source)
+        return True
+    except sqlite3.Error:
+        log.exception("TG delivery: не удалось записать сообщение в outbox")
+        return False
+
+
+def enqueue_alert(text: str, source: str, priority: float = 0.0, chat_id: Optional[str] = None,
+                  token: Optional[str] = None, parse_mode: Optional[str] = "HTML",
+                  disable_web_page_preview: bool = True) -> bool:
+    """
+    Алерт в дайджест источника source: копится DIGEST_WINDOWS[source] секунд, выше priority — раньше
+    в сообщении. Без окна для источника ведёт себя как enqueue(). True — алерт сохранён.
+    """
+    window = DIGEST_WINDOWS.get(source, 0)
+    if window <= 0:
+        return enqueue(text, chat_id=chat_id, token=token, parse_mode=parse_mode,
+                       disable_web_page_preview=disable_web_page_preview, source=source)
+    token = token or _env_any(TOKEN_ENV)
+    chat_id = chat_id or _env_any(CHAT_ENV)
+    if not (token and chat_id):
+        return False
+    try:
+        get_delivery().enqueue_alert(text, token, str(chat_id), source, parse_mode,
+                                     disable_web_page_preview, priority, window)
+        return True
+    except sqlite3.Error:
+        log.exception("TG delivery: не удалось записать алерт в очередь дайджеста")
+        return False
+
+
+def flush(timeout: float = 30.0) -> bool:
+    return get_delivery().flush(timeout)
+
+
+def _flush_at_exit() -> None:
+    delivery = _delivery
+    if delivery is None or delivery._stop.is_set():
+        return
+    if not delivery.flush():
+        log.warning("TG delivery: при выходе в outbox остались неотправленные сообщения (%d)", len(delivery.outbox))
@@ -0,0 +1,141 @@
+# ticker_matcher.py
+"""
+Поиск тикеров/ключевых слов в тексте одним проходом.
+Все термины собираются в один регэксп-префиксное дерево (trie), поэтому стоимость
+скана почти не зависит от числа тикеров. Границы слова — как у \\b, кэштег $GME
+тоже считается: '$' не буква, граница перед тикером остаётся.
+
+    python ticker_matcher.py --posts 100000 --tickers 10000   # бенчмарк против старого цикла
+"""
+
+import re
+import sys
+import time
+import random
+import string
+import argparse
+from collections import Counter
+from typing import Dict, Iterable, List, Mapping, Set, Union
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    trie: Dict[str, dict] = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        # термин может закончиться здесь — продолжение делаем необязательным (жадно, длинные первыми)
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class TickerMatcher:
+    """
+    terms — список тикеров/фраз или словарь {термин: метка}; find() возвращает метки.
+    Регистр по умолчанию не важен (как раньше, когда текст приводили к upper()).
+    """
+
+    def __init__(self, terms: Union[Iterable[str], Mapping[str, str]], ignore_case: bool = True):
+        if not isinstance(terms, Mapping):
+            terms = {t: t for t in terms}
+        self.ignore_case = ignore_case
+        self._labels = {}
+        for term, label in terms.items():
+            term = term.strip()
+            if term:
+                self._labels[term.upper() if ignore_case else term] = label
+        flags = re.IGNORECASE if ignore_case else 0
+        if self._labels:
+            self._rx = re.compile(r"(?<!\w)(" + _trie_pattern(self._labels) + r")(?!\w)", flags)
+        else:
+            self._rx = None
+
+    def _label(self, hit: str) -> str:
+        return self._labels[hit.upper() if self.ignore_case else hit]
+
+    def find(self, text: str) -> Set[str]:
+        """Все метки, встретившиеся в тексте (каждая — один раз)."""
+        if self._rx is None or not text:
+            return set()
+        return {self._label(m) for m in self._rx.findall(text)}
+
+    def count(self, texts: Iterable[str]) -> Counter:
+        """Сколько текстов упоминают каждую метку."""
+        cnt = Counter()
+        for text in texts:
+            cnt.update(self.find(text))
+        return cnt
+
+
+# ---------------------------
+# Бенчмарк
+# ---------------------------
+def _legacy_count(texts: List[str], tickers: List[str]) -> Counter:
+    # прежняя реализация reddit_monitor._count_tickers_in_posts
+    cnt = Counter()
+    for t in texts:
+        text = t.upper()
+        for tk in tickers:
+            if f"${tk}" in text or f" {tk} " in f" {text} ":
+                cnt[tk] += 1
+    return cnt
+
+
+def _synthetic(n_posts: int, n_tickers: int, seed: int = 7):
+    rnd = random.Random(seed)
+    tickers = set()
+    while len(tickers) < n_tickers:
+        tickers.add("".join(rnd.choices(string.ascii_uppercase, k=rnd.randint(3, 5))))
+    tickers = sorted(tickers)
+    words = ["the", "stock", "moon", "buy", "sell", "calls", "puts", "earnings", "bag", "hold", "dip", "today"]
+    posts = []
+    for _ in range(n_posts):
+        toks = rnd.choices(words, k=rnd.randint(15, 60))
+        for _ in range(rnd.randint(0, 3)):
+            toks.insert(rnd.randrange(len(toks) + 1), ("$" if rnd.random() < 0.3 else "") + rnd.choice(tickers))
+        posts.append(" ".join(toks))
+    return posts, tickers
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="TickerMatcher vs legacy substring loop")
+    ap.add_argument("--posts", type=int, default=100_000)
+    ap.add_argument("--tickers", type=int, default=10_000)
+    ap.add_argument("--legacy-posts", type=int, default=500,
+                    help="старый цикл слишком медленный для всех постов — меряем на выборке и экстраполируем")
+    args = ap.parse_args(argv)
+
+    posts, tickers = _synthetic(args.posts, args.tickers)
+    t0 = time.perf_counter()
+    matcher = TickerMatcher(tickers)
+    t_compile = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    fast = matcher.count(posts)
+    t_fast = time.perf_counter() - t0
+
+    sample = posts[: args.legacy_posts]
+    t0 = time.perf_counter()
+    legacy = _legacy_count(sample, tickers)
+    t_legacy = (time.perf_counter() - t0) * len(posts) / max(1, len(sample))
+    new = matcher.count(sample)
+    # старый цикл ищет "$TK" подстрокой, поэтому $IZKH засчитывается и как IZK — это его ложные срабатывания
+    subset = all(new[k] <= legacy[k] for k in new)
+    extra = sum((legacy - new).values())
+
+    print(f"posts={len(posts)} tickers={len(tickers)}")
+    print(f"matcher: compile {t_compile:.2f}s, scan {t_fast:.2f}s, hits={sum(fast.values())}")
+    print(f"legacy:  ~{t_legacy:.1f}s (extrapolated from {len(sample)} posts), speedup ~{t_legacy / max(t_fast, 1e-9):.0f}x")
+    print(f"sample: matcher hits within legacy hits: {subset}; legacy-only (cashtag prefix) hits: {extra}")
+    return 0 if subset else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+# volume_store.py
+"""
+Локальное хранилище почасовых объёмов для скринера.
+На каждую монету — кольцевой буфер array('d') на 7 суток (как market_chart days=7),
+обновляется из total_volume страниц /coins/markets. Спайк = последний объём /
+среднее предыдущих, обе суммы ведём инкрементально — O(1) на обновление.
+"""
+
+import os
+import json
+import math
+import time
+import base64
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+log = logging.getLogger("screener")
+
+STORE_FILE = os.getenv("SCREENER_VOLUME_STORE", "screener_volumes.json")
+CAPACITY = 7 * 24 + 1
+MAX_COINS = int(os.getenv("SCREENER_VOLUME_MAX_COINS", "2000"))
+MAX_GAP_HOURS = 6  # дольше не видели монету — историю считаем протухшей
+
+
+class _Ring:
+    __slots__ = ("buf", "head", "count", "last_hour", "prev_sum", "pushes")
+
+    def __init__(self, capacity: int):
+        self.buf = array("d", bytes(8 * capacity))
+        self.head = 0  # индекс самого свежего значения
+        self.count = 0
+        self.last_hour = 0
+        self.prev_sum = 0.0  # сумма всех значений, кроме самого свежего
+        self.pushes = 0
+
+    def last(self) -> float:
+        return self.buf[self.head] if self.count else 0.0
+
+    def push(self, v: float) -> None:
+        cap = len(self.buf)
+        if self.count:
+            self.prev_sum += self.buf[self.head]
+        if self.count == cap:
+            # освобождаем самый старый слот
+            oldest = (self.head + 1) % cap
+            self.prev_sum -= self.buf[oldest]
+        else:
+            self.count += 1
+        self.head = (self.head + 1) % cap
+        self.buf[self.head] = v
+        self.pushes += 1
+        if self.pushes % cap == 0:
+            self._resync()
+
+    def _resync(self) -> None:
+        # раз в оборот буфера пересчитываем сумму точно, чтобы не копилась ошибка округления
+        cap = len(self.buf)
+        self.prev_sum = math.fsum(self.buf[(self.head - i) % cap] for i in range(1, self.count))
+
+
+class VolumeStore:
+    def __init__(self, capacity: int = CAPACITY, max_coins: int = MAX_COINS):
+        self.capacity = capacity
+        self.max_coins = max_coins
+        self._rings: "OrderedDict[str, _Ring]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, coin_id: str) -> bool:
+        return coin_id in self._rings
+
+    def __len__(self) -> int:
+        return len(self._rings)
+
+    def _put(self, coin_id: str, ring: _Ring) -> None:
+        self._rings[coin_id] = ring
+        self._rings.move_to_end(coin_id)
+        while len(self._rings) > self.max_coins:
+            self._rings.popitem(last=False)
+
+    def update(self, coin_id: str, volume: float, ts: Optional[float] = None) -> None:
+        """Новое значение 24h-объёма; монеты без истории пропускаем — их заполнит backfill()."""
+        with self._lock:
+            ring = self._rings.get(coin_id)
+            if ring is None:
+                return
+            hour = int((ts if ts is not None else time.time()) // 3600)
+            gap = hour - ring.last_hour
+            if gap <= 0:
+                ring.buf[ring.head] = float(volume)
+            elif gap > MAX_GAP_HOURS:
+                del self._rings[coin_id]
+                return
+            else:
+                # пропущенные часы заполняем последним известным значением
+                for _ in range(gap - 1):
+                    ring.push(ring.last())
+                ring.push(float(volume))
+                ring.last_hour = hour
+            self._rings.move_to_end(coin_id)
+
+    def update_many(self, coins: Iterable[Dict[str, Any]], ts: Optional[float] = None) -> None:
+        ts = ts if ts is not None else time.time()
+        for c in coins:
+            coin_id = c.get("id")
+            vol = c.get("total_volume")
+            if coin_id in self._rings and vol is not None:
+                self.update(coin_id, vol, ts)
+
+    def backfill(self, coin_id: str, chart: Dict[str, Any]) -> None:
+        """Заполнить историю монеты из ответа market_chart."""
+        points = chart.get("total_volumes", [])[-self.capacity:]
+        if not points:
+            return
+        volumes = [float(v or 0) for _, v in points]
+        ring = _Ring(self.capacity)
+        ring.buf[:len(volumes)] = array("d", volumes)
+        ring.head = len(volumes) - 1
+        ring.count = len(volumes)
+        ring.prev_sum = sum(volumes[:-1])
+        ring.last_hour = int(points[-1][0] // 3_600_000)
+        with self._lock:
+            self._put(coin_id, ring)
+
+    def average(self, coin_id: str) -> float:
+        ring = self._rings.get(coin_id)
+        if ring is None or ring.count < 2:
+            return 0.0
+        return ring.prev_sum / (ring.count - 1)
+
+    def spike(self, coin_id: str) -> float:
+        """То же, что volume_spike_from_chart, но без скачивания графика."""
+        ring = self._rings.get(coin_id)
+        if ring is None or not ring.count:
+            return 1.0
+        avg = ring.prev_sum / max(1, ring.count - 1)
+        return (ring.last() / avg) if avg > 0 else 1.0
+
+    # --- сохранение между рестартами ---
+    def save(self, path: str = STORE_FILE) -> None:
+        with self._lock:
+            coins = {
+                cid: [r.last_hour, r.head, r.count, base64.b64encode(r.buf.tobytes()).decode("ascii")]
+                for cid, r in self._rings.items()
+            }
+        tmp = f"{path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"capacity": self.capacity, "coins": coins}, f, separators=(",", ":"))
+            os.replace(tmp, path)
+        except OSError:
+            log.exception("volume store: не удалось сохранить %s", path)
+
+    @classmethod
+    def load(cls, path: str = STORE_FILE) -> "VolumeStore":
+        store = cls()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return store
+        except (OSError, ValueError):
+            log.warning("volume store: %s повреждён — начинаю с пустого", path)
+            return store
+        if data.get("capacity") != store.capacity:
+            return store
+        for cid, (last_hour, head, count, raw) in data.get("coins", {}).items():
+            ring = _Ring(store.capacity)
+            ring.buf = array("d", base64.b64decode(raw))
+            if len(ring.buf) != store.capacity:
+                continue
+            ring.last_hour, ring.head, ring.count = last_hour, head, count
+            ring._resync()
+            store._put(cid, ring)
+        return store